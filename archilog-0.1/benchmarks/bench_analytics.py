@@ -0,0 +1,75 @@
+"""Statistiques sur le grand livre : module analytics contre boucle sur Entry.
+
+    python benchmarks/bench_analytics.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers"]
+
+
+def naive_stats(models, bins: int) -> dict:
+    # ce que l'on faisait a partir de get_all_entries()
+    entries = models.get_all_entries()
+    amounts = [entry.amount for entry in entries]
+    by_category = {}
+    for entry in entries:
+        by_category.setdefault(entry.category, []).append(entry.amount)
+    low, high = min(amounts), max(amounts)
+    width = (high - low) / bins or 1.0
+    histogram = [0] * bins
+    for amount in amounts:
+        histogram[min(int((amount - low) / width), bins - 1)] += 1
+    return {
+        "quantiles": statistics.quantiles(amounts, n=100, method="inclusive"),
+        "categories": {k: (len(v), sum(v), statistics.median(v)) for k, v in by_category.items()},
+        "histogram": histogram,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--bins", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    import archilog.analytics as analytics
+    import archilog.models as models
+
+    models.init_db()
+    rng = random.Random(42)
+    with models.transaction() as conn:
+        for start in range(0, args.rows, 10_000):
+            models.insert_rows(conn, [
+                {
+                    "id": uuid.uuid4().hex,
+                    "name": f"depense-{i}",
+                    "amount": round(rng.lognormvariate(4, 1), 2),
+                    "category": rng.choice(CATEGORIES),
+                }
+                for i in range(start, min(start + 10_000, args.rows))
+            ])
+
+    runs = {"boucle sur Entry": lambda: naive_stats(models, args.bins)}
+    runs["analytics (array)"] = lambda: analytics.compute_stats(args.bins, use_numpy=False)
+    if analytics.np is not None:
+        runs["analytics (numpy)"] = lambda: analytics.compute_stats(args.bins, use_numpy=True)
+
+    print(f"{args.rows} lignes")
+    for name, fn in runs.items():
+        start = time.perf_counter()
+        fn()
+        print(f"{name:<22}{(time.perf_counter() - start) * 1000:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Charge sur /api/users/entries : serveur WSGI synchrone contre ASGI asynchrone.
+
+Lance chaque serveur avec un seul worker puis envoie --concurrency clients
+simultanes pendant --duration secondes (liste paginee et lecture unitaire).
+
+    pip install "archilog[async]" httpx
+    python benchmarks/bench_async.py --rows 50000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers"]
+HEADERS = {"Authorization": "Bearer admin_token"}
+
+SYNC_SERVER = (
+    "import sys; from werkzeug.serving import run_simple; from archilog.views import create_app; "
+    "run_simple('127.0.0.1', int(sys.argv[1]), create_app(), threaded=sys.argv[2] == 'threads')"
+)
+
+
+def start_server(kind: str, port: int) -> subprocess.Popen:
+    if kind == "async":
+        command = [sys.executable, "-m", "uvicorn", "archilog.views.asgi:app",
+                   "--port", str(port), "--workers", "1", "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-c", SYNC_SERVER, str(port), kind]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/api/users/entries?limit=1", headers=HEADERS)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("le serveur ne repond pas")
+
+
+async def load(port: int, ids: list[str], concurrency: int, duration: float) -> tuple[int, int, list[float]]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        await wait_ready(client)
+        latencies, errors = [], 0
+        deadline = time.perf_counter() + duration
+
+        async def worker(seed: int):
+            nonlocal errors
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                if rng.random() < 0.5:
+                    url = f"/api/users/entries?limit=50&sort=amount&min_amount={rng.uniform(1, 4000):.2f}"
+                else:
+                    url = f"/api/users/entries/{rng.choice(ids)}"
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url, headers=HEADERS)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.TransportError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return len(latencies), errors, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["ARCHILOG_LOG_REQUESTS"] = "False"
+    os.environ["ARCHILOG_ENTRY_CACHE_SIZE"] = "0"
+
+    import archilog.models as models
+
+    models.init_db()
+    rng = random.Random(42)
+    ids = [uuid.uuid4().hex for _ in range(args.rows)]
+    with models.transaction() as conn:
+        models.insert_rows(conn, [
+            {"id": id, "name": f"depense-{i}", "amount": round(rng.uniform(1, 5000), 2), "category": rng.choice(CATEGORIES)}
+            for i, id in enumerate(ids)
+        ])
+
+    print(f"{args.rows} entrees, {args.concurrency} clients, {args.duration:.0f} s, 1 worker")
+    print(f"{'serveur':<26}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'erreurs':>10}")
+    for kind, label in (("single", "WSGI sans threads"), ("threads", "WSGI un thread/requete"), ("async", "ASGI (aiosqlite)")):
+        server = start_server(kind, args.port)
+        try:
+            count, errors, latencies = asyncio.run(load(args.port, ids, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"{label:<26}{count / args.duration:>10.0f}{quantiles[49] * 1000:>10.1f}{quantiles[94] * 1000:>10.1f}{errors:>10}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
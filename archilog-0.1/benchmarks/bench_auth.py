@@ -0,0 +1,54 @@
+"""Latence d'une requete authentifiee (Basic auth) : hachage a chaque requete
+contre cache des identifiants verifies.
+
+    python benchmarks/bench_auth.py --requests 200
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["ARCHILOG_LOG_REQUESTS"] = "False"
+
+    import archilog.models as models
+    from archilog import auth
+    from archilog.views import create_app
+
+    models.init_db()
+    client = create_app().test_client()
+    headers = {"Authorization": "Basic " + base64.b64encode(b"admin:adminpassword").decode()}
+
+    def run(label: str) -> None:
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            assert client.get("/reports", headers=headers).status_code == 200
+        elapsed = (time.perf_counter() - start) / args.requests
+        print(f"{label:<28}{elapsed * 1000:>10.2f} ms/requete")
+
+    def verify(label: str, repeat: int) -> None:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            auth.check_password("admin", "adminpassword")
+        print(f"{label:<28}{(time.perf_counter() - start) / repeat * 1e6:>10.1f} us/verification")
+
+    cache_size = auth.credential_cache.maxsize
+    auth.credential_cache.maxsize = 0
+    run("sans cache (hachage)")
+    verify("check_password sans cache", 20)
+    auth.credential_cache.maxsize = cache_size
+    run("avec cache")
+    verify("check_password avec cache", 100_000)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
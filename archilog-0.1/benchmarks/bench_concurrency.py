@@ -0,0 +1,102 @@
+"""Debit SQLite avec plusieurs processus ecrivains et lecteurs concurrents.
+
+Compare la configuration d'origine (journal rollback, synchronous=FULL,
+pas de busy timeout) avec les reglages par defaut de archilog.Config.
+
+    python benchmarks/bench_concurrency.py --writers 4 --readers 4 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    "origine": {
+        "ARCHILOG_SQLITE_WAL": "False",
+        "ARCHILOG_SQLITE_SYNCHRONOUS": "FULL",
+        "ARCHILOG_SQLITE_BUSY_TIMEOUT": "0",
+        "ARCHILOG_SQLITE_MMAP_SIZE": "0",
+    },
+    "optimise": {},
+}
+
+
+def worker(role: str, env: dict, duration: float, results):
+    os.environ.update(env)
+
+    from sqlalchemy.exc import OperationalError
+
+    import archilog.models as models
+
+    ops = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            if role == "writer":
+                models.create_entry("bench", 42.0, "concurrence")
+            else:
+                models.list_entries(50, category="concurrence", sort="amount")
+            ops += 1
+        except OperationalError:
+            errors += 1
+    results.put((role, ops, errors))
+
+
+def run_profile(name: str, overrides: dict, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    env = {"ARCHILOG_DATABASE_URL": f"sqlite:///{workdir}/bench.db", **overrides}
+
+    init = multiprocessing.get_context("spawn").Process(target=_init_db, args=(env,))
+    init.start()
+    init.join()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    roles = ["writer"] * args.writers + ["reader"] * args.readers
+    processes = [ctx.Process(target=worker, args=(role, env, args.duration, results)) for role in roles]
+    for p in processes:
+        p.start()
+    totals = {"writer": [0, 0], "reader": [0, 0]}
+    for _ in processes:
+        role, ops, errors = results.get()
+        totals[role][0] += ops
+        totals[role][1] += errors
+    for p in processes:
+        p.join()
+
+    return {
+        "profil": name,
+        "ecritures/s": totals["writer"][0] / args.duration,
+        "lectures/s": totals["reader"][0] / args.duration,
+        "erreurs de verrou": totals["writer"][1] + totals["reader"][1],
+    }
+
+
+def _init_db(env: dict):
+    os.environ.update(env)
+    import archilog.models as models
+
+    models.init_db()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rows = [run_profile(name, overrides, args) for name, overrides in PROFILES.items()]
+    print(f"{args.writers} ecrivains, {args.readers} lecteurs, {args.duration}s")
+    print(f"{'profil':<12}{'ecritures/s':>14}{'lectures/s':>14}{'erreurs':>10}")
+    for row in rows:
+        print(
+            f"{row['profil']:<12}{row['ecritures/s']:>14.0f}"
+            f"{row['lectures/s']:>14.0f}{row['erreurs de verrou']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
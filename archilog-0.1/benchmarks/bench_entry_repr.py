@@ -0,0 +1,90 @@
+"""Memoire et debit : dataclass Entry (UUID) contre EntryRow (tuple brut).
+
+Compare la construction de la liste complete puis sa serialisation en
+dictionnaires (ce que fait l'API) pour chaque representation.
+
+    python benchmarks/bench_entry_repr.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers"]
+
+
+@dataclass
+class LegacyEntry:
+    # Entry avant passage en slots, pour comparaison
+    id: uuid.UUID
+    name: str
+    amount: float
+    category: str
+
+
+def measure(label: str, build, serialize) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = build()
+    built = time.perf_counter()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    serialize(items)
+    done = time.perf_counter()
+    print(f"{label:<28}{built - start:>10.2f}{done - built:>14.2f}{memory / 1e6:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from sqlalchemy import select
+
+    import archilog.models as models
+
+    models.init_db()
+    rng = random.Random(42)
+    with models.transaction() as conn:
+        for start in range(0, args.rows, 10_000):
+            models.insert_rows(conn, [
+                {
+                    "id": uuid.uuid4().hex,
+                    "name": f"depense-{i}",
+                    "amount": round(rng.uniform(1, 5000), 2),
+                    "category": rng.choice(CATEGORIES),
+                }
+                for i in range(start, min(start + 10_000, args.rows))
+            ])
+
+    with models.get_engine().connect() as conn:
+        rows = conn.execute(select(*models.ENTRY_COLUMNS)).fetchall()
+
+    def legacy_dict(entries):
+        return [{"id": e.id.hex, "name": e.name, "amount": e.amount, "category": e.category} for e in entries]
+
+    print(f"{args.rows} lignes (temps en s, memoire de la liste en Mo)")
+    print(f"{'representation':<28}{'construction':>10}{'serialisation':>14}{'memoire':>12}")
+    measure(
+        "dataclass + UUID (origine)",
+        lambda: [LegacyEntry(uuid.UUID(r[0]), r[1], r[2], r[3]) for r in rows],
+        legacy_dict,
+    )
+    measure("Entry slots + UUID", lambda: [models.Entry.from_db(*r) for r in rows], legacy_dict)
+    measure(
+        "EntryRow (tuple brut)",
+        lambda: list(map(models.EntryRow._make, rows)),
+        lambda entries: [e._asdict() for e in entries],
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Latence des recherches sur profile avant et apres la migration des index.
+
+    python benchmarks/bench_indexes.py --rows 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers"]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from sqlalchemy import delete, func, select
+
+    import archilog.migrations as migrations
+    import archilog.models as models
+
+    models.init_db()
+
+    # on simule une base anterieure aux index : schema en version 0
+    with models.transaction() as conn:
+        for index in models.profile_table.indexes:
+            index.drop(conn)
+        conn.execute(delete(migrations.schema_version_table))
+
+    rng = random.Random(42)
+    ids = []
+    with models.transaction() as conn:
+        batch = []
+        for i in range(args.rows):
+            entry_id = uuid.uuid4().hex
+            ids.append(entry_id)
+            batch.append({
+                "id": entry_id,
+                "name": f"depense-{rng.randrange(args.rows):07d}",
+                "amount": round(rng.uniform(1, 5000), 2),
+                "category": rng.choice(CATEGORIES),
+            })
+            if len(batch) == 10_000:
+                models.insert_rows(conn, batch)
+                batch = []
+        models.insert_rows(conn, batch)
+
+    table = models.profile_table
+    # prefixes en fin d'espace de cles : un balayage ne s'y arrete pas tot
+    late_prefix = f"depense-{args.rows - 100:07d}"[:-2]
+    missing_prefix = "depense-9"
+    queries = {
+        "get_entry": lambda: models.get_entry(uuid.UUID(rng.choice(ids))),
+        "category = ?": lambda: models.list_entries(50, category=rng.choice(CATEGORIES), sort="amount"),
+        "amount BETWEEN": lambda: models.list_entries(50, min_amount=1000, max_amount=1010, sort="amount"),
+        "name prefix debut": lambda: models.list_entries(50, name_prefix="depense-00012", sort="name"),
+        "name prefix fin": lambda: models.list_entries(50, name_prefix=late_prefix, sort="name"),
+        "name prefix fin, id": lambda: models.list_entries(50, name_prefix=late_prefix),
+        "name prefix absent": lambda: models.list_entries(50, name_prefix=missing_prefix),
+        "count by category": lambda: _scalar(
+            models.get_engine(), select(func.count()).where(table.c.category == rng.choice(CATEGORIES))
+        ),
+    }
+
+    before = {name: timed(fn, args.repeat) for name, fn in queries.items()}
+    migrations.upgrade(models.get_engine())
+    after = {name: timed(fn, args.repeat) for name, fn in queries.items()}
+
+    print(f"{args.rows} lignes, moyenne sur {args.repeat} requetes (ms)")
+    print(f"{'requete':<24}{'avant':>12}{'apres':>12}")
+    for name in queries:
+        print(f"{name:<24}{before[name]:>12.3f}{after[name]:>12.3f}")
+
+
+def _scalar(engine, stmt):
+    with engine.connect() as conn:
+        return conn.execute(stmt).scalar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
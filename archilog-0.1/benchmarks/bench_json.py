@@ -0,0 +1,81 @@
+"""Serialisation de GET /entries : json de Flask contre orjson, et mode NDJSON.
+
+    python benchmarks/bench_json.py --rows 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers"]
+
+
+def timed(label: str, fn, repeat: int) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        size = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<32}{elapsed * 1000:>10.1f} ms{size / 1e6:>10.1f} Mo")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["ARCHILOG_LOG_REQUESTS"] = "False"
+
+    from flask.json.provider import DefaultJSONProvider
+
+    import archilog.models as models
+    from archilog import config, serialization
+    from archilog.views import create_app
+
+    models.init_db()
+    rng = random.Random(42)
+    with models.transaction() as conn:
+        models.insert_rows(conn, [
+            {
+                "id": uuid.uuid4().hex,
+                "name": f"depense-{i}",
+                "amount": round(rng.uniform(1, 5000), 2),
+                "category": rng.choice(CATEGORIES),
+            }
+            for i in range(args.rows)
+        ])
+
+    app = create_app()
+    rows, _ = models.list_entries(args.rows)
+    payload = {"entries": [row._asdict() for row in rows], "next": None}
+
+    def jsonify_with(provider):
+        def run():
+            app.json = provider
+            with app.app_context():
+                return len(app.json.response(payload).get_data())
+        return run
+
+    def ndjson(backend):
+        def run():
+            config.JSON_BACKEND = backend
+            return sum(len(chunk) for chunk in serialization.iter_ndjson(models.iter_entries()))
+        return run
+
+    print(f"{args.rows} entrees")
+    timed("jsonify (json de Flask)", jsonify_with(DefaultJSONProvider(app)), args.repeat)
+    if serialization.orjson is None:
+        print("orjson absent : pip install 'archilog[json]'")
+    else:
+        timed("jsonify (orjson)", jsonify_with(serialization.FastJSONProvider(app)), args.repeat)
+        timed("NDJSON depuis le curseur (orjson)", ndjson("orjson"), args.repeat)
+    timed("NDJSON depuis le curseur (json)", ndjson("json"), args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
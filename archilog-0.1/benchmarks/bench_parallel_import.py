@@ -0,0 +1,70 @@
+"""Passage a l'echelle de l'import CSV selon le nombre de processus d'analyse.
+
+Mesure separement l'analyse/validation seule et l'import complet (avec
+ecriture en base) pour chaque valeur de --workers.
+
+    python benchmarks/bench_parallel_import.py --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers"]
+
+
+def write_csv(path: str, rows: int) -> None:
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("name,amount,category\n")
+        for i in range(rows):
+            f.write(f"depense-{i},{rng.uniform(1, 5000):.2f},{rng.choice(CATEGORIES)}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--parse-only", action="store_true", help="Ne pas ecrire en base")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    csv_path = os.path.join(workdir, "ledger.csv")
+    write_csv(csv_path, args.rows)
+
+    import archilog.models as models
+    import archilog.services as services
+    from archilog import config
+
+    models.init_db()
+
+    print(f"{args.rows} lignes ({os.path.getsize(csv_path) / 1e6:.1f} Mo), {os.cpu_count()} coeurs")
+    print(f"{'workers':>8}{'analyse (lignes/s)':>22}{'import (lignes/s)':>20}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        if workers <= 1:
+            with open(csv_path, "rb") as f:
+                reader = csv.DictReader(io.TextIOWrapper(f, encoding="utf-8", newline=""))
+                rows = [(reader.line_num, row) for row in reader]
+                services._check_chunk(rows)
+        else:
+            for _ in services._parallel_batches(
+                csv_path, config.IMPORT_BATCH_SIZE, workers, config.IMPORT_PARSE_CHUNK_BYTES
+            ):
+                pass
+        parse_rate = args.rows / (time.perf_counter() - start)
+
+        import_rate = float("nan")
+        if not args.parse_only:
+            report = services.import_csv_file(csv_path, workers=workers)
+            import_rate = report.rows_per_second
+        print(f"{workers:>8}{parse_rate:>22.0f}{import_rate:>20.0f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
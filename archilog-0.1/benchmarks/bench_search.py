@@ -0,0 +1,94 @@
+"""Recherche par nom ou categorie : balayage LIKE '%mot%' contre index FTS5
+et table de termes (repli hors SQLite).
+
+    python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+WORDS = [
+    "loyer", "appartement", "garage", "courses", "carrefour", "marche", "boulangerie", "essence",
+    "train", "metro", "cinema", "concert", "pharmacie", "medecin", "electricite", "gaz", "internet",
+    "telephone", "assurance", "impot", "restaurant", "cafe", "livre", "vetements", "cadeau",
+]
+CATEGORIES = ["logement", "alimentation", "transport", "loisirs", "sante", "energie", "impots", None]
+QUERIES = ["loyer", "pharm", "cafe sante", "electricite energie", "con", "train transport", "zzz"]
+
+
+def seed(models, rows: int, rng: random.Random) -> float:
+    start = time.perf_counter()
+    for offset in range(0, rows, 10_000):
+        batch = [
+            {
+                "id": uuid.uuid4().hex,
+                "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+                "amount": round(rng.uniform(1, 5000), 2),
+                "category": rng.choice(CATEGORIES),
+            }
+            for i in range(offset, min(offset + 10_000, rows))
+        ]
+        with models.transaction() as conn:
+            models.insert_rows(conn, batch)
+    return time.perf_counter() - start
+
+
+def measure(label: str, search, repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{label:<28}p50 {statistics.median(timings) * 1000:>9.2f} ms   max {timings[-1] * 1000:>9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from sqlalchemy import or_, select
+
+    import archilog.models as models
+
+    models.init_db()
+    print(f"insertion de {args.rows} lignes (FTS5)  {seed(models, args.rows, random.Random(0)):.1f} s")
+
+    table = models.profile_table
+
+    def like_scan(query: str):
+        stmt = select(table)
+        for word in query.split():
+            stmt = stmt.where(or_(table.c.name.contains(word), table.c.category.contains(word)))
+        with models.get_engine().connect() as conn:
+            return conn.execute(stmt.limit(21)).fetchall()
+
+    def search(query: str):
+        return models.search_entries(query, 20)
+
+    measure("LIKE '%mot%' (balayage)", like_scan, args.repeat)
+    measure("FTS5", search, args.repeat)
+
+    # repli : table de termes, comme sur une base sans FTS5
+    with models.transaction() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {models.SEARCH_FTS_TABLE}")
+        models._search_backends.clear()
+        start = time.perf_counter()
+        models.refresh_search_index(conn)
+    print(f"construction search_terms      {time.perf_counter() - start:.1f} s")
+    measure("table search_terms", search, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Demarrage a froid de la CLI : temps mural des commandes simples et
+modules les plus couteux d'apres python -X importtime.
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --src /autre/checkout/src   # comparaison
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COMMANDS = [
+    ["--help"],
+    ["get-entry", "--id", "{id}"],
+    ["export-csv", "--output", "{dir}/export.csv"],
+]
+
+
+def run(command: list[str], env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def top_imports(command: list[str], env: dict, count: int) -> list[tuple[int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *command[1:]],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        # modules imbriques compris : sous -c, la commande n'est qu'un seul import de premier niveau
+        if cumulative.strip().isdigit():
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--src", default=os.path.join(os.path.dirname(__file__), "..", "src"))
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.path.abspath(args.src),
+        "ARCHILOG_DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "ARCHILOG_LOG_FILE": "",
+    }
+    # cmd.py n'a pas de bloc __main__ : "-m archilog.views.cmd" importerait le module sans rien executer
+    cli = [sys.executable, "-c", "from archilog.views.cmd import cli; cli()"]
+    subprocess.run([*cli, "init-db"], env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    subprocess.run([*cli, "create", "-n", "loyer", "-a", "800", "-c", "logement"], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listing = subprocess.run([*cli, "get-entries"], env=env, check=True, capture_output=True, text=True).stdout
+    if "ID: " not in listing:
+        sys.exit(f"entree de test introuvable dans get-entries :\n{listing}")
+    entry_id = listing.split("ID: ", 1)[1].split(",", 1)[0]
+
+    baseline = run([sys.executable, "-c", "pass"], env)
+    print(f"{os.path.abspath(args.src)} ({args.runs} executions, interpreteur seul {baseline * 1000:.0f} ms)")
+    print(f"{'commande':<24}{'median ms':>12}{'min ms':>10}")
+    for arguments in COMMANDS:
+        command = [*cli, *(a.format(id=entry_id, dir=workdir) for a in arguments)]
+        timings = [run(command, env) for _ in range(args.runs)]
+        print(f"{arguments[0]:<24}{statistics.median(timings) * 1000:>12.0f}{min(timings) * 1000:>10.0f}")
+
+    print("\nImports les plus couteux pour get-entry (cumul, ms)")
+    command = [*cli, "get-entry", "--id", entry_id]
+    for cumulative, name in top_imports(command, env, args.top):
+        print(f"  {cumulative / 1000:>8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Suite de benchmarks : CRUD, listes, import et export CSV, API Flask.
+
+Chaque taille de grand livre est mesuree dans un processus separe, sur une
+base SQLite temporaire remplie de donnees synthetiques. Les resultats sont
+ecrits en JSON pour comparer deux commits.
+
+    pdm run bench
+    pdm run bench --sizes 10000 --output avant.json
+    pdm run bench --sizes 10000 --compare avant.json
+
+Sans --output, le fichier va dans benchmarks/results/ (ignore par git).
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+CATEGORIES = ["loyer", "courses", "transport", "loisirs", "sante", "energie", "impots", "divers", None]
+SEED_BATCH = 10_000
+API_HEADERS = {"Authorization": "Bearer admin_token"}
+WEB_HEADERS = {"Authorization": "Basic " + base64.b64encode(b"admin:adminpassword").decode()}
+
+
+def latency(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {
+        "count": repeat,
+        "mean_us": round(statistics.fmean(timings) * 1e6, 1),
+        "p50_us": round(quantiles[49] * 1e6, 1),
+        "p95_us": round(quantiles[94] * 1e6, 1),
+        "ops_per_second": round(repeat / sum(timings), 1),
+    }
+
+
+def throughput(fn, rows: int, memory: bool) -> dict:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    result = {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed, 1)}
+    if memory:
+        # second passage sous tracemalloc : le temps mesure ci-dessus n'en souffre pas
+        tracemalloc.start()
+        fn()
+        result["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+    return result
+
+
+def seed(models, size: int, rng: random.Random) -> list[str]:
+    ids = []
+    for start in range(0, size, SEED_BATCH):
+        batch = []
+        for i in range(start, min(start + SEED_BATCH, size)):
+            ids.append(uuid.uuid4().hex)
+            batch.append({
+                "id": ids[-1],
+                "name": f"depense-{i:07d}",
+                "amount": round(rng.uniform(1, 5000), 2),
+                "category": rng.choice(CATEGORIES),
+            })
+        with models.transaction() as conn:
+            models.insert_rows(conn, batch)
+    return ids
+
+
+def bench_api(app, ids: list[str], rng: random.Random, requests: int) -> dict:
+    client = app.test_client()
+
+    def list_pages():
+        # parcours de 20 pages de 100 entrees via le curseur
+        url = "/api/users/entries?limit=100"
+        for _ in range(20):
+            body = client.get(url, headers=API_HEADERS).get_json()
+            if not body["next"]:
+                break
+            url = f"/api/users/entries?limit=100&cursor={body['next']}"
+
+    def get_one():
+        assert client.get(f"/api/users/entries/{rng.choice(ids)}", headers=API_HEADERS).status_code == 200
+
+    def create_one():
+        payload = {"name": "bench-api", "amount": round(rng.uniform(1, 5000), 2), "category": "api"}
+        assert client.post("/api/users/entries", json=payload, headers=API_HEADERS).status_code == 201
+
+    def filtered():
+        low = rng.uniform(1, 4900)
+        url = f"/api/users/entries?limit=50&sort=amount&min_amount={low:.2f}&max_amount={low + 100:.2f}"
+        assert client.get(url, headers=API_HEADERS).status_code == 200
+
+    def all_entries_page():
+        assert client.get("/all_entries?sort=amount&order=desc&limit=100", headers=WEB_HEADERS).status_code == 200
+
+    def search():
+        url = f"/api/users/entries/search?q={rng.choice(CATEGORIES[:-1])}&limit=20"
+        assert client.get(url, headers=API_HEADERS).status_code == 200
+
+    return {
+        "list_20_pages": latency(list_pages, max(requests // 20, 5)),
+        "get_entry": latency(get_one, requests),
+        "create_entry": latency(create_one, requests),
+        "filtered_by_amount": latency(filtered, requests),
+        "search": latency(search, requests),
+        "web_all_entries": latency(all_entries_page, requests),
+    }
+
+
+def run_size(size: int, memory: bool, requests: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="archilog-bench-")
+    os.environ["ARCHILOG_DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["ARCHILOG_LOG_LEVEL"] = "WARNING"
+    os.environ["ARCHILOG_LOG_FILE"] = ""
+
+    import archilog.models as models
+    import archilog.services as services
+    from archilog.views import create_app
+
+    models.init_db()
+    rng = random.Random(size)
+    results = {"size": size}
+
+    start = time.perf_counter()
+    ids = seed(models, size, rng)
+    results["seed"] = {"seconds": round(time.perf_counter() - start, 3)}
+
+    def create():
+        models.create_entry("bench", round(rng.uniform(1, 5000), 2), rng.choice(CATEGORIES))
+
+    def get_cold():
+        models.entry_cache.clear()
+        models.get_entry(uuid.UUID(rng.choice(ids)))
+
+    hot_ids = [uuid.UUID(id) for id in ids[:100]]
+
+    def get_warm():
+        models.get_entry(rng.choice(hot_ids))
+
+    results["create_entry"] = latency(create, requests)
+    results["get_entry_cold"] = latency(get_cold, requests)
+    for id in hot_ids:
+        models.get_entry(id)
+    results["get_entry_warm"] = latency(get_warm, requests * 10)
+    # meme lecture sans cache : un acces en cache doit couter nettement moins
+    results["load_entry"] = latency(lambda: models.load_entry(rng.choice(hot_ids)), requests * 10)
+
+    rows = size + requests
+    results["get_all_entries"] = throughput(models.get_all_entries, rows, memory)
+    results["get_all_entries_raw"] = throughput(lambda: models.get_all_entries(raw=True), rows, memory)
+    results["export_to_csv"] = throughput(services.export_to_csv, rows, memory)
+
+    results["api"] = bench_api(create_app(), ids, rng, requests)
+
+    # import en dernier : il double la taille de la table
+    data = services.export_to_csv().getvalue().encode()
+    rows = data.count(b"\n") - 1
+    results["import_from_csv"] = throughput(lambda: services.import_from_csv(io.BytesIO(data)), rows, False)
+    if memory:
+        # tout-ou-rien avec une ligne invalide en fin de fichier : tout est
+        # ecrit puis annule, la table ne grossit pas une seconde fois
+        invalid = data + b"sans-montant,,\n"
+        tracemalloc.start()
+        services.import_from_csv(io.BytesIO(invalid), mode=services.ALL_OR_NOTHING)
+        results["import_from_csv"]["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(data: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and key not in ("size", "count", "rows"):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(previous: dict, current: dict) -> None:
+    print(f"\n{'mesure':<58}{'avant':>12}{'apres':>12}{'ratio':>8}")
+    for size, result in current["results"].items():
+        before = flatten(previous["results"].get(size, {}))
+        for key, value in flatten(result).items():
+            if key in before and before[key]:
+                print(f"{size + ' ' + key:<58}{before[key]:>12}{value:>12}{value / before[key]:>8.2f}")
+
+
+def print_summary(size: str, result: dict) -> None:
+    print(f"\n== {size} entrees")
+    for key in ("create_entry", "get_entry_cold", "get_entry_warm", "load_entry"):
+        r = result[key]
+        print(f"  {key:<24} p50 {r['p50_us']:>10.1f} us   p95 {r['p95_us']:>10.1f} us")
+    for key in ("get_all_entries", "get_all_entries_raw", "export_to_csv", "import_from_csv"):
+        r = result[key]
+        memory = f"   pic {r['peak_memory_mb']:>8.1f} Mo" if "peak_memory_mb" in r else ""
+        print(f"  {key:<24} {r['rows_per_second']:>12.0f} lignes/s{memory}")
+    for key, r in result["api"].items():
+        print(f"  api {key:<20} p50 {r['p50_us'] / 1000:>10.2f} ms   {r['ops_per_second']:>8.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Tailles de grand livre, separees par des virgules")
+    parser.add_argument("--requests", type=int, default=200, help="Appels par mesure de latence")
+    parser.add_argument("--no-memory", action="store_true", help="Ne pas mesurer le pic memoire (plus rapide)")
+    parser.add_argument("--output", default=None, help="Fichier JSON (par defaut results/bench-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Fichier JSON d'une execution precedente")
+    parser.add_argument("--size", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size is not None:
+        # processus enfant : une seule taille, resultat sur stdout
+        json.dump(run_size(args.size, not args.no_memory, args.requests), sys.stdout)
+        return
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+        },
+        "results": {},
+    }
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")]))}
+    for size in (int(s) for s in args.sizes.split(",")):
+        command = [sys.executable, __file__, "--size", str(size), "--requests", str(args.requests)]
+        if args.no_memory:
+            command.append("--no-memory")
+        output = subprocess.run(command, env=env, capture_output=True, text=True)
+        if output.returncode != 0:
+            sys.stderr.write(output.stderr)
+            return output.returncode
+        report["results"][str(size)] = json.loads(output.stdout)
+        print_summary(str(size), report["results"][str(size)])
+
+    path = args.output
+    if path is None:
+        # a cote du script plutot que dans le repertoire courant, souvent le depot
+        results = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        os.makedirs(results, exist_ok=True)
+        path = os.path.join(results, f"bench-{commit or 'local'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultats ecrits dans {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
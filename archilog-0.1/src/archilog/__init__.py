@@ -1,42 +1,151 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from dataclasses import dataclass
+import queue
+import threading
+from dataclasses import dataclass, field
 
 from dotenv import load_dotenv
 
 load_dotenv()
+
+# empreintes precalculees (werkzeug.security.generate_password_hash) des
+# comptes de developpement : rien n'est hache au demarrage
+DEFAULT_USERS = {
+    "admin": "scrypt:32768:8:1$3vlSdIIqr4S5QrNN$5f24407db149780f89604298703987b7fba8d7ca42043d5179696c5846a8fed452f01dc53e707c60c3a9ece2f9466198bf4c3464f150f881f94718384690b457",
+    "user": "scrypt:32768:8:1$pCbLTRghj8Rhkk1X$aba08979315f171ec357efc59226e06901bb524141a68754439e07b5c6b32acd940c0678a0b48ca355488959714d84079fec420d8840004979a741897458e83f",
+}
+DEFAULT_API_TOKENS = {
+    "admin_token": "admin",
+    "user_token": "user",
+}
+
 @dataclass
 class Config:
     DATABASE_URL: str
     DEBUG: bool
     SECRET_KEY: str 
+    IMPORT_BATCH_SIZE: int
+    EXPORT_BATCH_SIZE: int
+    DB_POOL_SIZE: int
+    DB_MAX_OVERFLOW: int
+    DB_POOL_PRE_PING: bool
+    SQLITE_WAL: bool
+    SQLITE_SYNCHRONOUS: str
+    SQLITE_BUSY_TIMEOUT: int
+    SQLITE_MMAP_SIZE: int
+    SQL_ECHO: bool
+    LOG_LEVEL: str
+    LOG_FILE: str
+    LOG_REQUESTS: bool
+    ENTRY_CACHE_SIZE: int
+    ENTRY_CACHE_TTL: float
+    ENTRY_CACHE_BACKEND: str
+    ENTRY_CACHE_SYNC_MS: float
+    IMPORT_JOB_WORKERS: int
+    IMPORT_JOB_QUEUE_SIZE: int
+    IMPORT_SPOOL_DIR: str
+    IMPORT_PARSE_WORKERS: int
+    IMPORT_PARSE_CHUNK_BYTES: int
+    IMPORT_NATURAL_KEY: tuple
+    JSON_BACKEND: str
+    ASYNC_DATABASE_URL: str
+    # hors repr : la configuration est journalisee au chargement
+    USERS: dict = field(repr=False)
+    API_TOKENS: dict = field(repr=False)
+    AUTH_CACHE_SIZE: int
+    AUTH_CACHE_TTL: float
+    METRICS_ENABLED: bool
+    METRICS_TOKEN: str = field(repr=False)
+    PROFILE_SLOW_MS: float
+    PROFILE_INTERVAL_MS: float
+    PROFILE_DIR: str
 
 config = Config(
     DATABASE_URL=os.getenv("ARCHILOG_DATABASE_URL", 'sqlite:///data.db'),
     DEBUG=os.getenv("ARCHILOG_DEBUG", "False") == "True",
-    SECRET_KEY=os.getenv("SECRET_KEY", "dev-secret-key")  
+    SECRET_KEY=os.getenv("SECRET_KEY", "dev-secret-key"),
+    IMPORT_BATCH_SIZE=int(os.getenv("ARCHILOG_IMPORT_BATCH_SIZE", "5000")),
+    EXPORT_BATCH_SIZE=int(os.getenv("ARCHILOG_EXPORT_BATCH_SIZE", "1000")),
+    DB_POOL_SIZE=int(os.getenv("ARCHILOG_DB_POOL_SIZE", "5")),
+    DB_MAX_OVERFLOW=int(os.getenv("ARCHILOG_DB_MAX_OVERFLOW", "10")),
+    DB_POOL_PRE_PING=os.getenv("ARCHILOG_DB_POOL_PRE_PING", "True") == "True",
+    SQLITE_WAL=os.getenv("ARCHILOG_SQLITE_WAL", "True") == "True",
+    SQLITE_SYNCHRONOUS=os.getenv("ARCHILOG_SQLITE_SYNCHRONOUS", "NORMAL").upper(),
+    SQLITE_BUSY_TIMEOUT=int(os.getenv("ARCHILOG_SQLITE_BUSY_TIMEOUT", "5000")),
+    SQLITE_MMAP_SIZE=int(os.getenv("ARCHILOG_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    SQL_ECHO=os.getenv("ARCHILOG_SQL_ECHO", "False") == "True",
+    LOG_LEVEL=os.getenv("ARCHILOG_LOG_LEVEL", "DEBUG" if os.getenv("ARCHILOG_DEBUG") == "True" else "INFO").upper(),
+    LOG_FILE=os.getenv("ARCHILOG_LOG_FILE", "app_config.log"),
+    LOG_REQUESTS=os.getenv("ARCHILOG_LOG_REQUESTS", "True") == "True",
+    ENTRY_CACHE_SIZE=int(os.getenv("ARCHILOG_ENTRY_CACHE_SIZE", "10000")),
+    ENTRY_CACHE_TTL=float(os.getenv("ARCHILOG_ENTRY_CACHE_TTL", "60")),
+    ENTRY_CACHE_BACKEND=os.getenv("ARCHILOG_ENTRY_CACHE_BACKEND", ""),
+    ENTRY_CACHE_SYNC_MS=float(os.getenv("ARCHILOG_ENTRY_CACHE_SYNC_MS", "1000")),
+    IMPORT_JOB_WORKERS=int(os.getenv("ARCHILOG_IMPORT_JOB_WORKERS", "2")),
+    IMPORT_JOB_QUEUE_SIZE=int(os.getenv("ARCHILOG_IMPORT_JOB_QUEUE_SIZE", "8")),
+    IMPORT_SPOOL_DIR=os.getenv("ARCHILOG_IMPORT_SPOOL_DIR", ""),
+    IMPORT_PARSE_WORKERS=int(os.getenv("ARCHILOG_IMPORT_PARSE_WORKERS", "1")),
+    IMPORT_PARSE_CHUNK_BYTES=int(os.getenv("ARCHILOG_IMPORT_PARSE_CHUNK_BYTES", str(4 * 1024 * 1024))),
+    IMPORT_NATURAL_KEY=tuple(c.strip() for c in os.getenv("ARCHILOG_IMPORT_NATURAL_KEY", "name,category").split(",")),
+    JSON_BACKEND=os.getenv("ARCHILOG_JSON_BACKEND", "auto").lower(),
+    ASYNC_DATABASE_URL=os.getenv("ARCHILOG_ASYNC_DATABASE_URL", ""),
+    USERS=json.loads(os.getenv("ARCHILOG_USERS", "null")) or DEFAULT_USERS,
+    API_TOKENS=json.loads(os.getenv("ARCHILOG_API_TOKENS", "null")) or DEFAULT_API_TOKENS,
+    AUTH_CACHE_SIZE=int(os.getenv("ARCHILOG_AUTH_CACHE_SIZE", "1024")),
+    AUTH_CACHE_TTL=float(os.getenv("ARCHILOG_AUTH_CACHE_TTL", "60")),
+    METRICS_ENABLED=os.getenv("ARCHILOG_METRICS_ENABLED", "False") == "True",
+    METRICS_TOKEN=os.getenv("ARCHILOG_METRICS_TOKEN", ""),
+    PROFILE_SLOW_MS=float(os.getenv("ARCHILOG_PROFILE_SLOW_MS", "0")),
+    PROFILE_INTERVAL_MS=float(os.getenv("ARCHILOG_PROFILE_INTERVAL_MS", "5")),
+    PROFILE_DIR=os.getenv("ARCHILOG_PROFILE_DIR", "profiles"),
 )
 
 
-logging.basicConfig(
-    level=logging.DEBUG,  
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(),  
-        logging.FileHandler("app_config.log")  
-    ]
-)
+def configure_logging() -> logging.handlers.QueueListener:
+    # les handlers (console, fichier) tournent dans le thread du QueueListener :
+    # le thread de la requete ne fait qu'empiler l'enregistrement
+    handlers = [logging.StreamHandler()]
+    if config.LOG_FILE:
+        handlers.append(logging.FileHandler(config.LOG_FILE))
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s %(message)s")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(config.LOG_LEVEL)
+    return listener
+
 
 
-logging.debug(f"Chargement de la configuration - DATABASE_URL: {config.DATABASE_URL}, DEBUG: {config.DEBUG}")
+log_listener: logging.handlers.QueueListener | None = None
+_logging_lock = threading.Lock()
 
 DEBUG = config.DEBUG == 'True' 
 
-logging.debug(f"Valeur de DEBUG après conversion : {DEBUG}")
 
 
+def setup_logging() -> logging.handlers.QueueListener:
+    # appele par create_app et par la CLI, pas a l'import : importer archilog
+    # ne demarre aucun thread et n'ouvre pas le fichier de log
+    global log_listener
+    with _logging_lock:
+        if log_listener is not None:
+            return log_listener
+        log_listener = configure_logging()
 
-logging.info(f"Configuration chargée : {config}")
+    logging.debug("Chargement de la configuration - DATABASE_URL: %s, DEBUG: %s", config.DATABASE_URL, config.DEBUG)
+    logging.debug("Valeur de DEBUG après conversion : %s", DEBUG)
+    logging.debug("Configuration chargée : %s", config)
 
-if not config.DATABASE_URL:
-    logging.warning("La variable d'environnement DATABASE_URL est vide ou manquante.")
\ No newline at end of file
+    if not config.DATABASE_URL:
+        logging.warning("La variable d'environnement DATABASE_URL est vide ou manquante.")
+    return log_listener
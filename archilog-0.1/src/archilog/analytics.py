@@ -0,0 +1,179 @@
+import math
+from array import array
+from dataclasses import dataclass
+
+from sqlalchemy import func, or_, select
+
+import archilog.models as models
+from archilog import config, metrics
+
+try:
+    import numpy as np
+except ImportError:  # numpy est optionnel : repli sur le module array
+    np = None
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+OUTLIER_SAMPLE_SIZE = 20
+
+
+
+@dataclass
+class Columns:
+    # montants tries par (categorie, montant) : chaque categorie est une
+    # tranche contigue amounts[starts[i]:starts[i + 1]]
+    amounts: array
+    categories: list[str | None]
+    starts: list[int]
+
+
+
+def load_columns(batch_size: int | None = None) -> Columns:
+    # l'index (category, amount) fournit directement l'ordre voulu
+    table = models.profile_table
+    stmt = select(table.c.category, table.c.amount).order_by(table.c.category, table.c.amount)
+
+    amounts = array("d")
+    categories, starts = [], []
+    current = object()
+    with models.get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size or config.EXPORT_BATCH_SIZE).execute(stmt)
+        for partition in result.partitions():
+            for category, amount in partition:
+                if category != current:
+                    current = category
+                    categories.append(category)
+                    starts.append(len(amounts))
+                amounts.append(amount)
+    return Columns(amounts, categories, starts)
+
+
+
+def _quantile_sorted(values, q: float) -> float:
+    # interpolation lineaire, comme numpy.quantile par defaut
+    position = (len(values) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+
+def _numpy_stats(columns: Columns, bins: int) -> dict:
+    amounts = np.frombuffer(columns.amounts, dtype=np.float64)
+    starts = np.asarray(columns.starts, dtype=np.intp)
+    ends = np.append(starts[1:], amounts.size)
+    counts = ends - starts
+
+    # group-by vectorise : les tranches sont contigues, reduceat suffit
+    totals = np.add.reduceat(amounts, starts)
+    mins = amounts[starts]
+    maxs = amounts[ends - 1]
+    medians = (amounts[starts + (counts - 1) // 2] + amounts[starts + counts // 2]) / 2
+
+    hist_counts, edges = np.histogram(amounts, bins=bins)
+    quantiles = np.quantile(amounts, QUANTILES)
+
+    return {
+        "count": int(amounts.size),
+        "total": float(amounts.sum()),
+        "mean": float(amounts.mean()),
+        "std": float(amounts.std()),
+        "min": float(amounts.min()),
+        "max": float(amounts.max()),
+        "quantiles": [float(v) for v in quantiles],
+        "histogram": {"edges": edges.tolist(), "counts": hist_counts.tolist()},
+        "categories": [
+            {
+                "category": category,
+                "count": int(counts[i]),
+                "total": float(totals[i]),
+                "mean": float(totals[i] / counts[i]),
+                "median": float(medians[i]),
+                "min": float(mins[i]),
+                "max": float(maxs[i]),
+            }
+            for i, category in enumerate(columns.categories)
+        ],
+    }
+
+
+
+def _python_stats(columns: Columns, bins: int) -> dict:
+    amounts = columns.amounts
+    count = len(amounts)
+    total = math.fsum(amounts)
+    mean = total / count
+    std = math.sqrt(math.fsum((x - mean) ** 2 for x in amounts) / count)
+
+    categories = []
+    ends = columns.starts[1:] + [count]
+    for category, start, end in zip(columns.categories, columns.starts, ends):
+        group = amounts[start:end]
+        group_total = math.fsum(group)
+        categories.append({
+            "category": category,
+            "count": end - start,
+            "total": group_total,
+            "mean": group_total / (end - start),
+            "median": _quantile_sorted(group, 0.5),
+            "min": group[0],
+            "max": group[-1],
+        })
+
+    ordered = sorted(amounts)
+    low, high = ordered[0], ordered[-1]
+    # meme convention que np.histogram : montants tous egaux, bornes elargies de 0,5
+    first, last = (low - 0.5, high + 0.5) if low == high else (low, high)
+    width = (last - first) / bins
+    hist_counts = [0] * bins
+    for x in amounts:
+        hist_counts[min(int((x - first) / width), bins - 1)] += 1
+    edges = [first + i * width for i in range(bins)] + [last]
+
+    return {
+        "count": count,
+        "total": total,
+        "mean": mean,
+        "std": std,
+        "min": low,
+        "max": high,
+        "quantiles": [_quantile_sorted(ordered, q) for q in QUANTILES],
+        "histogram": {"edges": edges, "counts": hist_counts},
+        "categories": categories,
+    }
+
+
+
+def _outliers(q1: float, q3: float) -> dict:
+    # regle de Tukey ; les entrees concernees sont relues via l'index sur amount
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    table = models.profile_table
+    condition = or_(table.c.amount < low, table.c.amount > high)
+    entries = select(*models.ENTRY_COLUMNS).limit(OUTLIER_SAMPLE_SIZE)
+    with models.get_engine().connect() as conn:
+        count = conn.execute(select(func.count()).where(condition)).scalar()
+        # un echantillon de chaque cote : les plus grandes et les plus petites
+        largest = conn.execute(entries.where(table.c.amount > high).order_by(table.c.amount.desc())).fetchall()
+        smallest = conn.execute(entries.where(table.c.amount < low).order_by(table.c.amount)).fetchall()
+    return {
+        "low": low,
+        "high": high,
+        "count": count,
+        "largest": [dict(row._mapping) for row in largest],
+        "smallest": [dict(row._mapping) for row in smallest],
+    }
+
+
+
+@metrics.timed("analytics.compute_stats")
+def compute_stats(bins: int = 20, use_numpy: bool | None = None) -> dict:
+    use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+    columns = load_columns()
+    if not columns.amounts:
+        return {"backend": "numpy" if use_numpy else "array", "count": 0}
+
+    stats = _numpy_stats(columns, bins) if use_numpy else _python_stats(columns, bins)
+    stats["backend"] = "numpy" if use_numpy else "array"
+    stats["quantiles"] = {f"p{round(q * 100):02d}": v for q, v in zip(QUANTILES, stats["quantiles"])}
+    stats["outliers"] = _outliers(stats["quantiles"]["p25"], stats["quantiles"]["p75"])
+    return stats
@@ -0,0 +1,145 @@
+import uuid
+from collections.abc import AsyncIterator, Callable
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+import archilog.models as models
+from archilog import config, observability
+
+# pilotes asynchrones utilises quand ARCHILOG_ASYNC_DATABASE_URL n'est pas defini
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+_engine: AsyncEngine | None = None
+
+
+
+def async_database_url(database_url: str) -> str:
+    if config.ASYNC_DATABASE_URL:
+        return config.ASYNC_DATABASE_URL
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Pas de pilote asynchrone connu pour {backend}, définir ARCHILOG_ASYNC_DATABASE_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+
+def get_engine() -> AsyncEngine:
+    # cree a la premiere requete : dans la boucle d'evenements du serveur
+    global _engine
+    if _engine is None:
+        _engine = models._create_engine(async_database_url(config.DATABASE_URL), create_async_engine)
+    return _engine
+
+
+
+async def _write(fn: Callable, *args):
+    # memes helpers que models.transaction : totaux, version et caches
+    # restent coherents quel que soit le chemin d'ecriture
+    async with get_engine().connect() as conn:
+        await conn.execution_options(archilog_write=True)
+        async with conn.begin():
+            await conn.run_sync(models.start_write)
+            result = await conn.run_sync(fn, *args)
+            written = await conn.run_sync(models.finish_write)
+    models.notify_written(written)
+    return result
+
+
+
+async def create_entry(name: str, amount: float, category: str | None) -> dict:
+    new_entry = {
+        "id": uuid.uuid4().hex,
+        "name": name,
+        "amount": amount,
+        "category": category,
+    }
+    await _write(models.insert_rows, [new_entry])
+    return new_entry
+
+
+
+async def update_entry(id: uuid.UUID, name: str, amount: float, category: str | None) -> None:
+    await _write(models.update_rows, [{"id": id.hex, "name": name, "amount": amount, "category": category}])
+
+
+
+async def delete_entry(id: uuid.UUID) -> None:
+    await _write(models.delete_rows, [id.hex])
+
+
+
+async def get_entry(id: uuid.UUID) -> models.Entry:
+    table = models.profile_table
+    async with get_engine().connect() as conn:
+        result = (await conn.execute(select(*models.ENTRY_COLUMNS).where(table.c.id == id.hex))).first()
+    if result is None:
+        raise Exception("Entry not found")
+    observability.add_rows(1)
+    return models.Entry.from_db(*result)
+
+
+
+async def list_entries(
+    limit: int,
+    after: tuple | None = None,
+    sort: str = "id",
+    descending: bool = False,
+    category: str | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    name_prefix: str | None = None,
+) -> tuple[list[models.EntryRow], tuple | None]:
+    stmt = models._entries_statement(after, sort, descending, category, min_amount, max_amount, name_prefix)
+    async with get_engine().connect() as conn:
+        rows = list(map(models.EntryRow._make, await conn.execute(stmt.limit(limit + 1))))
+    observability.add_rows(len(rows))
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = (getattr(last, models.SORT_COLUMNS[sort].name), last.id)
+    return rows, next_key
+
+
+
+async def iter_entries(
+    after: tuple | None = None,
+    sort: str = "id",
+    descending: bool = False,
+    category: str | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    name_prefix: str | None = None,
+    batch_size: int | None = None,
+) -> AsyncIterator[list[models.EntryRow]]:
+    stmt = models._entries_statement(after, sort, descending, category, min_amount, max_amount, name_prefix)
+    async with get_engine().connect() as conn:
+        result = await conn.stream(stmt, execution_options={"yield_per": batch_size or config.EXPORT_BATCH_SIZE})
+        async for partition in result.partitions():
+            observability.add_rows(len(partition))
+            yield list(map(models.EntryRow._make, partition))
+
+
+
+async def data_version() -> tuple[int, float]:
+    table = models.data_version_table
+    async with get_engine().connect() as conn:
+        row = (await conn.execute(
+            select(table.c.version, table.c.updated_at).where(table.c.name == models.PROFILE_VERSION)
+        )).first()
+    return (row.version, row.updated_at) if row else (0, 0.0)
+
+
+
+async def dispose() -> None:
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
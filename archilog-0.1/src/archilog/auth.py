@@ -0,0 +1,58 @@
+import hashlib
+import hmac
+import os
+
+from werkzeug.security import check_password_hash
+
+from archilog import config, metrics
+from archilog.cache import LRUCache
+
+# cle propre au processus : les entrees du cache ne sont pas reutilisables ailleurs
+_cache_secret = os.urandom(32)
+
+credential_cache = LRUCache(config.AUTH_CACHE_SIZE, config.AUTH_CACHE_TTL)
+
+_token_digests = [
+    (hashlib.sha256(token.encode()).digest(), user)
+    for token, user in config.API_TOKENS.items()
+]
+
+
+
+class InvalidCredentials(Exception):
+    pass
+
+
+
+@metrics.timed("auth.check_password")
+def check_password(username: str, password: str) -> str | None:
+    # le hachage lent n'est fait qu'une fois par TTL ; seul un condensat HMAC
+    # du couple (empreinte, mot de passe) sert de cle, jamais le mot de passe
+    stored = config.USERS.get(username)
+    if stored is None:
+        return None
+
+    key = hmac.new(_cache_secret, f"{stored}\0{password}".encode(), hashlib.sha256).hexdigest()
+
+    def verify() -> str:
+        if not check_password_hash(stored, password):
+            raise InvalidCredentials()
+        return username
+
+    # les echecs ne sont pas mis en cache : LRUCache ne garde que les valeurs chargees
+    try:
+        return credential_cache.get_or_load(key, verify)
+    except InvalidCredentials:
+        return None
+
+
+
+@metrics.timed("auth.check_token")
+def check_token(token: str) -> str | None:
+    # comparaison a temps constant sur tous les jetons, sans sortie anticipee
+    digest = hashlib.sha256(token.encode()).digest()
+    found = None
+    for stored, user in _token_digests:
+        if hmac.compare_digest(digest, stored):
+            found = user
+    return found
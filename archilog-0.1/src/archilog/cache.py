@@ -0,0 +1,209 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Any, Protocol
+
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Any | None: ...
+
+    def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+
+class DictBackend:
+    # stand-in d'un cache partage (Redis, memcached...) pour un seul processus
+    def __init__(self):
+        self._data: dict[str, tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        item = self._data.get(key)
+        if item is None or item[0] < time.time():
+            return None
+        return pickle.loads(item[1])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl, pickle.dumps(value))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+
+class FileBackend:
+    # un fichier par cle : partageable entre les workers d'une meme machine
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, sha256(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Any | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if expires >= time.time() else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((time.time() + ttl, value), f)
+        os.replace(tmp, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+
+def backend_from_url(url: str) -> CacheBackend | None:
+    if not url:
+        return None
+    if url == "memory":
+        return DictBackend()
+    if url.startswith("file:"):
+        return FileBackend(url.removeprefix("file:"))
+    raise ValueError(f"Backend de cache inconnu : {url}")
+
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float, backend: CacheBackend | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.stats = CacheStats()
+        # cle -> (expiration, valeur)
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # incremente a chaque invalidation : une valeur lue avant une ecriture
+        # ne doit pas etre remise en cache apres celle-ci
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _get_local(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def _get_shared(self, key: str, version: Any) -> Any | None:
+        item = self.backend.get(key)
+        if item is None or (version is not None and (item[0] is None or item[0] < version)):
+            return None
+        return item[1]
+
+    def _set_local(self, key: str, value: Any, epoch: int) -> None:
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], version: Any = None) -> Any:
+        # version : etat de la source deja pris en compte par les invalidations
+        # de ce processus ; une valeur du backend partage chargee sous une
+        # version plus ancienne est ignoree, le cache local n'est pas compare
+        if self.maxsize <= 0:
+            return loader()
+
+        value = self._get_local(key)
+        if value is None and self.backend is not None:
+            value = self._get_shared(key, version)
+            if value is not None:
+                self._set_local(key, value, self._epoch)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+
+        self.stats.misses += 1
+        epoch = self._epoch
+        value = loader()
+        self._set_local(key, value, epoch)
+        if self.backend is not None and epoch == self._epoch:
+            self.backend.set(key, (version, value), self.ttl)
+        return value
+
+    def invalidate(self, keys: Iterable[str], shared: bool = True) -> None:
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                self._data.pop(key, None)
+                if shared and self.backend is not None:
+                    self.backend.delete(key)
+                self.stats.invalidations += 1
+
+    def clear(self, shared: bool = True) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+        if shared and self.backend is not None:
+            self.backend.clear()
+
+    def info(self) -> dict:
+        return {
+            **self.stats.to_dict(),
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+        }
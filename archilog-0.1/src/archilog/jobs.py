@@ -0,0 +1,155 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from archilog import config, metrics, services
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# nombre de taches terminees conservees pour le suivi
+FINISHED_JOBS_KEPT = 100
+
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+
+@dataclass
+class ImportJob:
+    id: str
+    filename: str
+    path: str
+    mode: str
+    delete_after: bool
+    batch_size: int | None = None
+    workers: int | None = None
+    upsert: str | None = None
+    status: str = QUEUED
+    report: services.ImportReport | None = None
+    message: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self, max_errors: int = 100) -> dict:
+        data = {
+            "id": self.id,
+            "filename": self.filename,
+            "mode": self.mode,
+            "upsert": self.upsert,
+            "status": self.status,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.report is not None:
+            data.update(self.report.to_dict(max_errors))
+        return data
+
+
+
+class ImportJobRunner:
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor: ThreadPoolExecutor | None = None
+        self._jobs: dict[str, ImportJob] = {}
+        self._lock = threading.Lock()
+
+    def _active(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _prune(self) -> None:
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[:-FINISHED_JOBS_KEPT]:
+            del self._jobs[job.id]
+
+    def submit(
+        self,
+        path: str,
+        filename: str,
+        mode: str = services.BEST_EFFORT,
+        delete_after: bool = True,
+        batch_size: int | None = None,
+        workers: int | None = None,
+        upsert: str | None = None,
+    ) -> ImportJob:
+        with self._lock:
+            if self._active() >= self.max_workers + self.max_queued:
+                raise JobQueueFull("Trop d'imports en cours, réessayez plus tard")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="archilog-import")
+            self._prune()
+            job = ImportJob(uuid.uuid4().hex, filename, path, mode, delete_after, batch_size, workers, upsert)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> ImportJob | None:
+        return self._jobs.get(job_id)
+
+    def counts(self) -> dict[str, int]:
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        for job in list(self._jobs.values()):
+            counts[job.status] += 1
+        return counts
+
+    def _run(self, job: ImportJob) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        status = DONE
+        try:
+            job.report = services.import_csv_file(
+                job.path, job.batch_size, job.mode, self._progress(job), job.workers, job.upsert
+            )
+        except Exception as e:
+            logger.exception("Echec de l'import %s (%s)", job.id, job.filename)
+            status = FAILED
+            job.message = str(e)
+        finally:
+            if job.delete_after:
+                try:
+                    os.remove(job.path)
+                except OSError:
+                    pass
+        job.finished_at = time.time()
+        job.status = status
+        metrics.IMPORT_JOBS.inc(1, status)
+        if job.report is not None:
+            metrics.IMPORT_ROWS.inc(job.report.rows_imported)
+
+    @staticmethod
+    def _progress(job: ImportJob):
+        def update(report: services.ImportReport) -> None:
+            job.report = report
+        return update
+
+
+
+def spool_upload(file_storage) -> str:
+    # le fichier est ecrit sur disque par morceaux, jamais charge en memoire
+    fd, path = tempfile.mkstemp(prefix="archilog-import-", suffix=".csv", dir=config.IMPORT_SPOOL_DIR or None)
+    with os.fdopen(fd, "wb") as f:
+        file_storage.save(f)
+    return path
+
+
+
+runner = ImportJobRunner(config.IMPORT_JOB_WORKERS, config.IMPORT_JOB_QUEUE_SIZE)
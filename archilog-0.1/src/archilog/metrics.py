@@ -0,0 +1,177 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+# secondes : de 0,5 ms (lecture en cache) a 10 s (import, export complet)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # par jeu de labels : [compteurs par classe (dont +Inf), somme, nombre]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(names, (*labels, _format_value(bound)))} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {count}"
+
+
+
+class Collected:
+    # valeurs lues au moment du rendu (pool, caches, taches) : rien a maintenir
+    def __init__(self, name: str, help: str, kind: str, labelnames: Iterable[str], collect: Callable[[], Iterable]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for *labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labelnames, tuple(labels))} {_format_value(value)}"
+
+
+
+registry: list = []
+
+
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+
+
+def collected(name: str, help: str, kind: str = "gauge", labelnames: Iterable[str] = ()):
+    def decorator(collect: Callable[[], Iterable]):
+        register(Collected(name, help, kind, labelnames, collect))
+        return collect
+    return decorator
+
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            lines.append(f"# {metric.name} indisponible : {e}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+
+REQUEST_SECONDS = register(Histogram(
+    "archilog_http_request_duration_seconds", "Duree des requetes HTTP", ("route", "method", "status"),
+))
+REQUEST_DB_SECONDS = register(Histogram(
+    "archilog_http_request_db_seconds", "Temps passe en base par requete HTTP", ("route", "method"),
+))
+REQUEST_QUERIES = register(Histogram(
+    "archilog_http_request_queries", "Requetes SQL par requete HTTP", ("route", "method"), QUERY_BUCKETS,
+))
+FUNCTION_SECONDS = register(Histogram(
+    "archilog_function_duration_seconds", "Duree des fonctions models/services/auth", ("function",),
+))
+FUNCTION_ERRORS = register(Counter(
+    "archilog_function_errors_total", "Exceptions levees par les fonctions instrumentees", ("function",),
+))
+IMPORT_JOBS = register(Counter(
+    "archilog_import_jobs_total", "Taches d'import terminees", ("status",),
+))
+IMPORT_ROWS = register(Counter(
+    "archilog_import_rows_total", "Lignes importees par les taches d'import",
+))
+
+
+
+def timed(name: str) -> Callable:
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                FUNCTION_ERRORS.inc(1, name)
+                raise
+            finally:
+                FUNCTION_SECONDS.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorator
@@ -0,0 +1,145 @@
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, update
+from sqlalchemy.exc import OperationalError
+
+import archilog.models as models
+
+
+logger = logging.getLogger(__name__)
+
+version_metadata = MetaData()
+
+schema_version_table = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable
+
+
+
+def _create_index(conn, name: str, table: str, *columns: str) -> None:
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+
+
+def _add_profile_indexes(conn) -> None:
+    _create_index(conn, "ix_profile_category", "profile", "category")
+    _create_index(conn, "ix_profile_name", "profile", "name")
+    _create_index(conn, "ix_profile_amount", "profile", "amount")
+
+
+
+def _add_category_amount_index(conn) -> None:
+    # index couvrant pour les GROUP BY category : plus besoin de lire la table
+    _create_index(conn, "ix_profile_category_amount", "profile", "category", "amount")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_profile_category")
+
+
+
+def _add_category_totals(conn) -> None:
+    models.category_totals_table.create(conn, checkfirst=True)
+    models.refresh_category_totals(conn)
+
+
+
+def _add_data_version(conn) -> None:
+    table = models.data_version_table
+    table.create(conn, checkfirst=True)
+    exists = conn.execute(select(table.c.name).where(table.c.name == models.PROFILE_VERSION)).first()
+    if exists is None:
+        conn.execute(table.insert().values(name=models.PROFILE_VERSION, version=1, updated_at=time.time()))
+
+
+
+def _add_search_index(conn) -> None:
+    fts = models.SEARCH_FTS_TABLE
+    if conn.dialect.name == "sqlite":
+        try:
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(name, category, content='profile', "
+                f"content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        except OperationalError:
+            # SQLite compile sans FTS5 : on retombe sur la table de termes
+            logger.warning("FTS5 indisponible, recherche via la table search_terms")
+        else:
+            conn.exec_driver_sql(
+                f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({models.SEARCH_NAME_WEIGHT}, "
+                f"{models.SEARCH_CATEGORY_WEIGHT})')"
+            )
+    models.search_terms_table.create(conn, checkfirst=True)
+    models._search_backends.clear()
+    models.refresh_search_index(conn)
+
+
+
+def _add_change_versions(conn) -> None:
+    # les lignes existantes prennent la version courante : un client qui part
+    # de since=0 les recoit toutes, un client deja a jour n'en recoit aucune
+    if "version" not in {column["name"] for column in inspect(conn).get_columns("profile")}:
+        conn.exec_driver_sql("ALTER TABLE profile ADD COLUMN version INTEGER")
+    table = models.data_version_table
+    current = conn.execute(select(table.c.version).where(table.c.name == models.PROFILE_VERSION)).scalar() or 0
+    profile = models.profile_table
+    conn.execute(update(profile).where(profile.c.version.is_(None)).values(version=current))
+    _create_index(conn, "ix_profile_version", "profile", "version", "id")
+    models.tombstones_table.create(conn, checkfirst=True)
+
+
+
+MIGRATIONS = [
+    Migration(1, "Index sur profile.category, profile.name et profile.amount", _add_profile_indexes),
+    Migration(2, "Index couvrant profile(category, amount) pour les rapports", _add_category_amount_index),
+    Migration(3, "Table category_totals maintenue a chaque ecriture", _add_category_totals),
+    Migration(4, "Compteur de version data_version pour les ETag HTTP", _add_data_version),
+    Migration(5, "Index de recherche plein texte (FTS5 ou table search_terms)", _add_search_index),
+    Migration(6, "Version par entree et suppressions pour le flux de changements", _add_change_versions),
+]
+
+
+
+def current_version(conn) -> int:
+    version_metadata.create_all(conn)
+    return conn.execute(select(func.max(schema_version_table.c.version))).scalar() or 0
+
+
+
+def pending(engine) -> list[Migration]:
+    with engine.connect() as conn:
+        version = current_version(conn)
+        conn.commit()
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+
+def upgrade(engine, target: int | None = None) -> list[Migration]:
+    applied = []
+    for migration in pending(engine):
+        if target is not None and migration.version > target:
+            break
+        # chaque migration et son enregistrement sont dans la meme transaction
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(schema_version_table.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now(timezone.utc),
+            ))
+        logger.info("Migration %d appliquee : %s", migration.version, migration.description)
+        applied.append(migration)
+    return applied
@@ -1,19 +1,44 @@
+import base64
+import heapq
+import itertools
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
 import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import NamedTuple
 
 from sqlalchemy import (
     Column,
     Float,
+    Index,
+    Integer,
     MetaData,
     String,
     Table,
+    and_,
+    bindparam,
+    case,
     create_engine,
     delete,
+    event,
+    func,
     insert,
+    literal,
+    or_,
+    select,
+    text,
     update,
 )
+from sqlalchemy.engine import make_url
 
-from archilog import config
+from archilog import config, metrics, observability
+from archilog.cache import LRUCache, backend_from_url
 
 metadata = MetaData()
 
@@ -24,19 +49,573 @@ profile_table = Table(
     Column("name", String),
     Column("amount", Float),
     Column("category", String, nullable=True),
+    # valeur de data_version de la transaction qui a ecrit la ligne en dernier
+    Column("version", Integer, nullable=True),
+    Index("ix_profile_category_amount", "category", "amount"),
+    Index("ix_profile_name", "name"),
+    Index("ix_profile_amount", "amount"),
+    Index("ix_profile_version", "version", "id"),
 )
 
+# colonnes d'une entree : version ne sert qu'au flux de changements
+ENTRY_COLUMNS = (profile_table.c.id, profile_table.c.name, profile_table.c.amount, profile_table.c.category)
 
-engine = create_engine(config.DATABASE_URL, echo=True)
+# agregats maintenus a chaque ecriture ; les entrees sans categorie sont
+# rangees sous NO_CATEGORY car une cle primaire ne peut pas etre NULL
+NO_CATEGORY = ""
+
+category_totals_table = Table(
+    "category_totals",
+    metadata,
+    Column("category", String, primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("total", Float, nullable=False),
+    Column("min", Float),
+    Column("max", Float),
+)
+
+# compteur incremente par chaque transaction qui modifie profile : sert
+# d'ETag et de Last-Modified aux lectures HTTP sans relire la table
+PROFILE_VERSION = "profile"
+
+data_version_table = Table(
+    "data_version",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+# suppressions, pour que le flux de changements les transmette ; retirees
+# si l'entree est recreee avec la meme id
+tombstones_table = Table(
+    "profile_tombstones",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Index("ix_profile_tombstones_version", "version", "id"),
+)
+
+# recherche plein texte : table virtuelle FTS5 sous SQLite, table de termes
+# ailleurs ; l'une ou l'autre est tenue a jour par les helpers d'ecriture
+SEARCH_FTS_TABLE = "profile_fts"
+
+search_terms_table = Table(
+    "search_terms",
+    metadata,
+    Column("term", String, primary_key=True),
+    Column("entry_id", String, primary_key=True),
+    Column("weight", Integer, nullable=False),
+    Index("ix_search_terms_entry_id", "entry_id"),
+)
+
+# un mot du nom pese plus qu'un mot de la categorie dans le classement
+SEARCH_NAME_WEIGHT = 2
+SEARCH_CATEGORY_WEIGHT = 1
+# seul le dernier mot est un prefixe (saisie en cours), a partir de 2 caracteres
+SEARCH_PREFIX_MIN = 2
+# au-dela, bm25 couterait O(resultats) : les plus recents passent en premier
+SEARCH_RANK_LIMIT = 10_000
+
+IN_CHUNK_SIZE = 500
+# cles naturelles par requete : une chaine de OR reste loin de SQLITE_MAX_EXPR_DEPTH
+KEY_CHUNK_SIZE = 200
+
+
+SQLITE_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+
+def _configure_sqlite(engine, memory: bool) -> None:
+    if config.SQLITE_SYNCHRONOUS not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"ARCHILOG_SQLITE_SYNCHRONOUS invalide : {config.SQLITE_SYNCHRONOUS}")
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # pysqlite ouvre ses transactions lui-meme : on les gere dans "begin"
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if config.SQLITE_WAL and not memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin_sqlite_transaction(conn):
+        # les ecritures prennent le verrou des le BEGIN : pas d'escalade
+        # lecture -> ecriture, donc pas de "database is locked" immediat
+        if conn.get_execution_options().get("archilog_write"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+
+
+def _create_engine(database_url: str, factory: Callable = create_engine):
+    url = make_url(database_url)
+    options = {"echo": config.SQL_ECHO, "pool_pre_ping": config.DB_POOL_PRE_PING}
+
+    memory = url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+    if not memory:
+        options["pool_size"] = config.DB_POOL_SIZE
+        options["max_overflow"] = config.DB_MAX_OVERFLOW
+
+    new_engine = factory(url, **options)
+    # un AsyncEngine delegue a un Engine synchrone : les evenements s'y attachent
+    sync_engine = getattr(new_engine, "sync_engine", new_engine)
+    if url.get_backend_name() == "sqlite":
+        _configure_sqlite(sync_engine, memory)
+    observability.instrument_engine(sync_engine)
+    return new_engine
+
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+
+def get_engine():
+    # cree a la premiere utilisation : importer models n'ouvre rien
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine(config.DATABASE_URL)
+    return _engine
+
+
+
+def __getattr__(name: str):
+    # models.engine reste disponible pour le code existant
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 
 def init_db():
-    metadata.create_all(engine)
+    from archilog import migrations
+
+    metadata.create_all(get_engine())
+    migrations.upgrade(get_engine())
+    _search_backends.clear()
+
+
+
+_write_listeners: list[Callable[[set[str]], None]] = []
+
+
+
+def on_write(listener: Callable[[set[str]], None]) -> Callable[[set[str]], None]:
+    _write_listeners.append(listener)
+    return listener
+
+
+
+def mark_written(conn, ids) -> None:
+    conn.info.setdefault("archilog_written", set()).update(ids)
+
+
+
+def start_write(conn) -> None:
+    conn.info["archilog_written"] = set()
+    conn.info["archilog_version"] = None
+
+
+
+def finish_write(conn) -> set[str]:
+    # appele dans la transaction, juste avant le commit
+    written = conn.info.pop("archilog_written")
+    if written and conn.info.get("archilog_version") is None:
+        _bump_version(conn)
+    conn.info.pop("archilog_version", None)
+    return written
+
+
+
+def write_version(conn) -> int:
+    # la premiere ecriture de la transaction incremente data_version et
+    # toutes ses lignes portent ce numero ; la ligne data_version reste
+    # verrouillee jusqu'au commit, les numeros suivent donc l'ordre des commits
+    version = conn.info.get("archilog_version")
+    if version is None:
+        version = conn.info["archilog_version"] = _bump_version(conn)
+    return version
+
+
+
+def notify_written(written: set[str]) -> None:
+    # les caches ne sont invalides qu'une fois le commit effectue
+    if written:
+        for listener in _write_listeners:
+            listener(written)
+
+
+
+@contextmanager
+def transaction():
+    with get_engine().connect() as conn:
+        conn.execution_options(archilog_write=True)
+        start_write(conn)
+        with conn.begin():
+            yield conn
+            written = finish_write(conn)
+    notify_written(written)
+
+
+
+def _bump_version(conn) -> int:
+    table = data_version_table
+    stmt = (
+        update(table)
+        .where(table.c.name == PROFILE_VERSION)
+        .values(version=table.c.version + 1, updated_at=time.time())
+    )
+    if conn.execute(stmt).rowcount == 0:
+        conn.execute(insert(table).values(name=PROFILE_VERSION, version=1, updated_at=time.time()))
+        return 1
+    return conn.execute(select(table.c.version).where(table.c.name == PROFILE_VERSION)).scalar()
+
+
+
+def data_version() -> tuple[int, float]:
+    table = data_version_table
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            select(table.c.version, table.c.updated_at).where(table.c.name == PROFILE_VERSION)
+        ).first()
+    return (row.version, row.updated_at) if row else (0, 0.0)
+
+
+
+def _chunks(items: list, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+
+def _fetch_rows(conn, ids: list[str]) -> dict:
+    found = {}
+    for chunk in _chunks(ids):
+        stmt = select(*ENTRY_COLUMNS).where(profile_table.c.id.in_(chunk))
+        found.update((row.id, row) for row in conn.execute(stmt))
+    return found
+
+
+
+def _apply_totals(conn, added: list, removed: list) -> None:
+    deltas = {}
+    for row, sign in [(r, 1) for r in added] + [(r, -1) for r in removed]:
+        amount = row["amount"]
+        delta = deltas.setdefault(
+            row["category"] or NO_CATEGORY,
+            {"count": 0, "total": 0.0, "min": None, "max": None, "removed": False},
+        )
+        delta["count"] += sign
+        delta["total"] += sign * amount
+        if sign > 0:
+            delta["min"] = amount if delta["min"] is None else min(delta["min"], amount)
+            delta["max"] = amount if delta["max"] is None else max(delta["max"], amount)
+        else:
+            delta["removed"] = True
+    if not deltas:
+        return
+
+    totals = category_totals_table.c
+    existing = set()
+    for chunk in _chunks(list(deltas)):
+        existing.update(conn.execute(select(totals.category).where(totals.category.in_(chunk))).scalars())
+
+    updates = [
+        {"b_category": k, "b_count": d["count"], "b_total": d["total"], "b_min": d["min"], "b_max": d["max"]}
+        for k, d in deltas.items() if k in existing
+    ]
+    if updates:
+        new_min, new_max = bindparam("b_min"), bindparam("b_max")
+        conn.execute(
+            update(category_totals_table)
+            .where(totals.category == bindparam("b_category"))
+            .values(
+                count=totals.count + bindparam("b_count"),
+                total=totals.total + bindparam("b_total"),
+                min=case((new_min.is_(None), totals.min), (totals.min.is_(None), new_min),
+                         (new_min < totals.min, new_min), else_=totals.min),
+                max=case((new_max.is_(None), totals.max), (totals.max.is_(None), new_max),
+                         (new_max > totals.max, new_max), else_=totals.max),
+            ),
+            updates,
+        )
+
+    inserts = [
+        {"category": k, "count": d["count"], "total": d["total"], "min": d["min"], "max": d["max"]}
+        for k, d in deltas.items() if k not in existing
+    ]
+    if inserts:
+        conn.execute(insert(category_totals_table), inserts)
+
+    # min/max ne se decrementent pas : on les relit via l'index (category, amount)
+    amount = profile_table.c.amount
+    for key in (k for k, d in deltas.items() if d["removed"]):
+        if key == NO_CATEGORY:
+            category_filter = or_(profile_table.c.category.is_(None), profile_table.c.category == NO_CATEGORY)
+        else:
+            category_filter = profile_table.c.category == key
+        bounds = conn.execute(select(func.count(), func.min(amount), func.max(amount)).where(category_filter)).one()
+        if bounds[0] == 0:
+            conn.execute(delete(category_totals_table).where(totals.category == key))
+        else:
+            conn.execute(
+                update(category_totals_table).where(totals.category == key).values(min=bounds[1], max=bounds[2])
+            )
+
+
+
+def search_terms(value: str | None) -> list[str]:
+    # minuscules sans accents : meme decoupage que le tokenizer unicode61 de FTS5
+    if not value:
+        return []
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return re.findall(r"\w+", "".join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+
+_search_backends: dict[str, bool] = {}
+
+
+
+def uses_fts(conn) -> bool:
+    # FTS5 n'est utilise que si la migration a pu creer la table virtuelle
+    key = str(conn.engine.url)
+    if key not in _search_backends:
+        _search_backends[key] = conn.dialect.name == "sqlite" and conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": SEARCH_FTS_TABLE},
+        ).first() is not None
+    return _search_backends[key]
+
+
+
+def _copy_to_fts(conn, ids: list[str], command: str = "") -> None:
+    # un INSERT ... SELECT par lot : FTS5 est ~10x plus lent ligne a ligne (triggers)
+    fts = SEARCH_FTS_TABLE
+    if command:
+        columns, values = f"{fts}, rowid, name, category", f"'{command}', rowid, name, category"
+    else:
+        columns = values = "rowid, name, category"
+    stmt = text(
+        f"INSERT INTO {fts}({columns}) SELECT {values} FROM profile WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    for chunk in _chunks(ids):
+        conn.execute(stmt, {"ids": chunk})
+
+
+
+def _index_search(conn, rows: list) -> None:
+    # apres l'ecriture dans profile
+    if uses_fts(conn):
+        _copy_to_fts(conn, [row["id"] for row in rows])
+        return
+    terms = []
+    for row in rows:
+        weights = dict.fromkeys(search_terms(row["category"]), SEARCH_CATEGORY_WEIGHT)
+        weights.update(dict.fromkeys(search_terms(row["name"]), SEARCH_NAME_WEIGHT))
+        terms.extend({"term": term, "entry_id": row["id"], "weight": weight} for term, weight in weights.items())
+    if terms:
+        conn.execute(insert(search_terms_table), terms)
+
+
+
+def _unindex_search(conn, ids: list[str]) -> None:
+    # avant l'ecriture : FTS5 (contenu externe) doit relire les anciennes valeurs
+    if uses_fts(conn):
+        _copy_to_fts(conn, ids, command="delete")
+        return
+    for chunk in _chunks(ids):
+        conn.execute(delete(search_terms_table).where(search_terms_table.c.entry_id.in_(chunk)))
+
+
+
+def refresh_search_index(conn) -> None:
+    if uses_fts(conn):
+        conn.exec_driver_sql(f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}) VALUES ('rebuild')")
+        return
+    conn.execute(delete(search_terms_table))
+    result = conn.execution_options(yield_per=config.EXPORT_BATCH_SIZE).execute(select(*ENTRY_COLUMNS))
+    for partition in result.partitions():
+        _index_search(conn, [row._mapping for row in partition])
+
+
+
+def insert_rows(conn, rows: list[dict]) -> None:
+    # executemany : une seule requete preparee pour tout le lot
+    if rows:
+        conn.execute(insert(profile_table).values(version=write_version(conn)), rows)
+        for chunk in _chunks([row["id"] for row in rows]):
+            conn.execute(delete(tombstones_table).where(tombstones_table.c.id.in_(chunk)))
+        _apply_totals(conn, added=rows, removed=[])
+        _index_search(conn, rows)
+        mark_written(conn, (row["id"] for row in rows))
+
+
+
+def update_rows(conn, rows: list[dict]) -> set[str]:
+    # une id repetee dans le lot : la derniere occurrence l'emporte, sinon
+    # l'ancienne ligne serait retiree plusieurs fois des totaux et de l'index
+    rows = list({row["id"]: row for row in rows}.values())
+    old_rows = _fetch_rows(conn, [row["id"] for row in rows])
+    rows = [row for row in rows if row["id"] in old_rows]
+    if rows:
+        _unindex_search(conn, [row["id"] for row in rows])
+        conn.execute(
+            update(profile_table)
+            .where(profile_table.c.id == bindparam("b_id"))
+            .values(
+                name=bindparam("b_name"), amount=bindparam("b_amount"), category=bindparam("b_category"),
+                version=write_version(conn),
+            ),
+            [{"b_id": r["id"], "b_name": r["name"], "b_amount": r["amount"], "b_category": r["category"]} for r in rows],
+        )
+        _apply_totals(conn, added=rows, removed=[old_rows[row["id"]]._mapping for row in rows])
+        _index_search(conn, rows)
+        mark_written(conn, old_rows)
+    return set(old_rows)
+
+
+
+def delete_rows(conn, ids: list[str]) -> set[str]:
+    old_rows = _fetch_rows(conn, ids)
+    if old_rows:
+        _unindex_search(conn, list(old_rows))
+        for chunk in _chunks(list(old_rows)):
+            conn.execute(delete(profile_table).where(profile_table.c.id.in_(chunk)))
+        version = write_version(conn)
+        conn.execute(insert(tombstones_table), [{"id": id, "version": version} for id in old_rows])
+        _apply_totals(conn, added=[], removed=[row._mapping for row in old_rows.values()])
+        mark_written(conn, old_rows)
+    return set(old_rows)
+
+
 
+# colonnes utilisables comme cle naturelle pour les imports en upsert
+NATURAL_KEY_COLUMNS = ("name", "amount", "category")
 
 
-@dataclass
+
+def natural_key(row, key: tuple[str, ...]) -> tuple:
+    # "" et NULL designent tous deux une categorie absente
+    return tuple(row[column] if row[column] != "" else None for column in key)
+
+
+
+def _find_by_key(conn, rows: list[dict], key: tuple[str, ...]) -> dict:
+    # toute la cle est comparee en SQL, une egalite par colonne et par cle :
+    # SQLite en fait un acces par index par cle (MULTI-INDEX OR) au lieu de
+    # lire toutes les lignes qui partagent la premiere colonne ; une colonne
+    # absente de la cle devient IS NULL OR = ''. SQL du driver assemble ici :
+    # compiler la meme expression par SQLAlchemy coute ~50x la requete
+    placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    found = {}
+    for chunk in _chunks(list({natural_key(row, key) for row in rows}), KEY_CHUNK_SIZE):
+        clauses, params = [], []
+        for values in chunk:
+            terms = []
+            for name, value in zip(key, values):
+                if value is None:
+                    terms.append(f"({name} IS NULL OR {name} = '')")
+                else:
+                    terms.append(f"{name} = {placeholder}")
+                    params.append(value)
+            clauses.append(f"({' AND '.join(terms)})")
+        result = conn.exec_driver_sql(
+            f"SELECT id, name, amount, category FROM profile WHERE {' OR '.join(clauses)}", tuple(params)
+        )
+        for row in result:
+            # cle deja en double dans la table : la plus petite id est mise a jour
+            row_key = natural_key(row._mapping, key)
+            if row_key not in found or row.id < found[row_key].id:
+                found[row_key] = row
+    return found
+
+
+
+def upsert_rows(conn, rows: list[dict], key: tuple[str, ...] = ("id",)) -> tuple[int, int]:
+    # pas d'INSERT ... ON CONFLICT : il contournerait totaux, index de recherche
+    # et invalidations ; les lignes inchangees ne sont pas reecrites du tout
+    if key == ("id",):
+        current = _fetch_rows(conn, [row["id"] for row in rows])
+    else:
+        found = _find_by_key(conn, rows, key)
+        current = {}
+        for row in rows:
+            match = found.get(natural_key(row, key))
+            if match is not None:
+                row["id"] = match.id
+                current[match.id] = match
+    # comme update_rows : une id repetee dans le lot, la derniere occurrence l'emporte
+    rows = list({row["id"]: row for row in rows}.values())
+
+    inserts, changes = [], []
+    for row in rows:
+        old = current.get(row["id"])
+        if old is None:
+            inserts.append(row)
+        elif (old.name, old.amount, old.category or None) != (row["name"], row["amount"], row["category"] or None):
+            changes.append(row)
+    if changes:
+        update_rows(conn, changes)
+    insert_rows(conn, inserts)
+    return len(inserts), len(changes)
+
+
+
+def refresh_category_totals(conn) -> list[tuple[str | None, dict | None, dict | None]]:
+    amount = profile_table.c.amount
+    category = func.coalesce(profile_table.c.category, NO_CATEGORY).label("category")
+    stmt = select(
+        category,
+        func.count().label("count"),
+        func.sum(amount).label("total"),
+        func.min(amount).label("min"),
+        func.max(amount).label("max"),
+    ).group_by(category)
+    expected = {
+        row.category: {"count": row.count, "total": row.total, "min": row.min, "max": row.max}
+        for row in conn.execute(stmt)
+    }
+    stored = {
+        row.category: {"count": row.count, "total": row.total, "min": row.min, "max": row.max}
+        for row in conn.execute(select(category_totals_table))
+    }
+
+    differences = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None or want["count"] != have["count"] or any(
+            not math.isclose(want[f] or 0, have[f] or 0, rel_tol=1e-9, abs_tol=1e-6) for f in ("total", "min", "max")
+        ):
+            differences.append((key or None, have, want))
+
+    conn.execute(delete(category_totals_table))
+    if expected:
+        conn.execute(insert(category_totals_table), [{"category": k, **v} for k, v in expected.items()])
+    return differences
+
+
+
+
+class EntryRow(NamedTuple):
+    # representation brute : id hexadecimal, pas d'objet UUID ni de __dict__
+    id: str
+    name: str
+    amount: float
+    category: str | None
+
+
+
+@dataclass(slots=True)
 class Entry:
     id: uuid.UUID
     name: str
@@ -51,6 +630,7 @@ class Entry:
     
     
     
+@metrics.timed("models.create_entry")
 def create_entry(name: str, amount: float, category: str) -> None:
     new_entry = {
         "id": uuid.uuid4().hex,
@@ -58,49 +638,473 @@ def create_entry(name: str, amount: float, category: str) -> None:
         "amount": amount,
         "category": category,
     }
-    stmt = insert(profile_table).values(new_entry)
-    with engine.connect() as conn:
-        conn.execute(stmt)
-        conn.commit()
+    with transaction() as conn:
+        insert_rows(conn, [new_entry])
     return new_entry
 
 
 
-def get_entry(id: uuid.UUID) -> Entry:
-    with engine.connect() as conn:
-        result = conn.execute(profile_table.select().where(profile_table.c.id == id.hex)).fetchone()
+@metrics.timed("models.create_entries")
+def create_entries(entries: list[dict]) -> list[dict]:
+    new_entries = [
+        {"id": uuid.uuid4().hex, "name": e["name"], "amount": e["amount"], "category": e.get("category")}
+        for e in entries
+    ]
+    with transaction() as conn:
+        insert_rows(conn, new_entries)
+    return new_entries
+
+
+
+entry_cache = LRUCache(
+    config.ENTRY_CACHE_SIZE,
+    config.ENTRY_CACHE_TTL,
+    backend_from_url(config.ENTRY_CACHE_BACKEND),
+)
+
+
+
+# data_version dont les changements sont deja retires du cache de ce processus
+_entry_sync = {"version": None, "checked": 0.0}
+_entry_sync_lock = threading.Lock()
+
+
+
+@on_write
+def _invalidate_entries(ids: set[str]) -> None:
+    entry_cache.invalidate(ids)
+
+
+
+def _changed_ids(conn, since: int, limit: int) -> list[str] | None:
+    # index (version, id) de profile et des suppressions ; None au-dela de limit
+    ids = []
+    for table in (profile_table, tombstones_table):
+        stmt = select(table.c.id).where(table.c.version > since).limit(limit + 1 - len(ids))
+        ids.extend(conn.execute(stmt).scalars())
+        if len(ids) > limit:
+            return None
+    return ids
+
+
+
+def sync_entry_cache(version: int | None = None) -> int | None:
+    # les ecritures du CLI ou des autres workers ne passent pas par on_write :
+    # les id modifiees depuis la derniere synchro sont retirees du cache, au
+    # plus toutes les ENTRY_CACHE_SYNC_MS, ou des que l'appelant a lu une
+    # data_version plus recente (ETag) ; entre les deux un acces en cache ne
+    # lit pas la base
+    synced = _entry_sync["version"]
+    if synced is not None:
+        if version is not None and version <= synced:
+            return synced
+        if version is None and time.monotonic() - _entry_sync["checked"] < config.ENTRY_CACHE_SYNC_MS / 1000:
+            return synced
+
+    with _entry_sync_lock:
+        synced = _entry_sync["version"]
+        if synced is not None and version is not None and version <= synced:
+            return synced
+        table = data_version_table
+        with get_engine().connect() as conn:
+            # version lue avant les id : aucun changement anterieur n'echappe
+            current = conn.execute(
+                select(table.c.version).where(table.c.name == PROFILE_VERSION)
+            ).scalar() or 0
+            # premiere synchro : rien n'a encore ete mis en cache sans elle
+            if synced is not None and current > synced:
+                changed = _changed_ids(conn, synced, max(entry_cache.maxsize, 1))
+                # le backend partage n'est pas vide ici : ses valeurs portent la
+                # version de leur chargement et les plus anciennes sont ignorees
+                if changed is None:
+                    entry_cache.clear(shared=False)
+                else:
+                    entry_cache.invalidate(changed, shared=False)
+        _entry_sync.update(version=max(current, synced or 0), checked=time.monotonic())
+        return _entry_sync["version"]
+
+
+
+def load_entry(id: uuid.UUID) -> Entry:
+    # lecture directe, sans cache : pour relire une entree avant de l'ecrire
+    with get_engine().connect() as conn:
+        result = conn.execute(select(*ENTRY_COLUMNS).where(profile_table.c.id == id.hex)).fetchone()
         if result:
+            observability.add_rows(1)
             return Entry.from_db(*result)
         else:
             raise Exception("Entry not found")
 
 
 
-def get_all_entries() -> list[Entry]:
-    with engine.connect() as conn:
-        results = conn.execute(profile_table.select()).fetchall()
+@metrics.timed("models.get_entry")
+def get_entry(id: uuid.UUID, version: int | None = None) -> Entry:
+    # version : data_version deja lue par l'appelant (ETag), l'entree servie
+    # n'est alors pas plus ancienne qu'elle
+    if entry_cache.maxsize <= 0:
+        return load_entry(id)
+    synced = sync_entry_cache(version)
+    return entry_cache.get_or_load(id.hex, lambda: load_entry(id), synced)
+
+
+
+@metrics.timed("models.get_all_entries")
+def get_all_entries(raw: bool = False) -> list[Entry] | list[EntryRow]:
+    with get_engine().connect() as conn:
+        results = conn.execute(select(*ENTRY_COLUMNS)).fetchall()
+        observability.add_rows(len(results))
+        if raw:
+            return list(map(EntryRow._make, results))
         return [Entry.from_db(*r) for r in results]
 
 
 
 
-def update_entry(id: uuid.UUID, name: str, amount: float, category: str | None) -> None:
+def iter_entry_batches(batch_size: int | None = None) -> Iterator[list[EntryRow]]:
+    # curseur cote serveur : seules batch_size lignes sont en memoire a la fois
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    with get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(select(*ENTRY_COLUMNS))
+        for partition in result.partitions():
+            observability.add_rows(len(partition))
+            yield list(map(EntryRow._make, partition))
+
+
+
+
+SORT_COLUMNS = {
+    "id": profile_table.c.id,
+    "name": profile_table.c.name,
+    "amount": profile_table.c.amount,
+}
+
+
+
+def encode_cursor(sort: str, descending: bool, key: tuple) -> str:
+    payload = json.dumps([sort, descending, *key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> tuple:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cursor_sort, cursor_descending, value, id = payload
+    except (ValueError, TypeError):
+        raise ValueError("Curseur invalide")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise ValueError("Le curseur ne correspond pas au tri demande")
+    return value, id
+
+
+
+def _entries_statement(
+    after: tuple | None,
+    sort: str,
+    descending: bool,
+    category: str | None,
+    min_amount: float | None,
+    max_amount: float | None,
+    name_prefix: str | None,
+):
+    # pagination par cle (keyset) : (colonne de tri, id) sert de curseur stable
+    column = SORT_COLUMNS[sort]
+    id_column = profile_table.c.id
+
+    stmt = select(*ENTRY_COLUMNS)
+    if category is not None:
+        stmt = stmt.where(profile_table.c.category == category)
+    if min_amount is not None:
+        stmt = stmt.where(profile_table.c.amount >= min_amount)
+    if max_amount is not None:
+        stmt = stmt.where(profile_table.c.amount <= max_amount)
+    if name_prefix:
+        # intervalle plutot que LIKE : LIKE ignore la casse sous SQLite et ne
+        # peut donc pas parcourir ix_profile_name (BINARY) ; prefixe sensible a la casse
+        name = profile_table.c.name
+        stmt = stmt.where(name >= name_prefix, name < name_prefix + "\U0010ffff")
+
+    if after is not None:
+        value, last_id = after
+        if column is id_column:
+            stmt = stmt.where(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            stmt = stmt.where(or_(column < value, and_(column == value, id_column < last_id)))
+        else:
+            stmt = stmt.where(or_(column > value, and_(column == value, id_column > last_id)))
+
+    if column is id_column:
+        order_by = [id_column.desc() if descending else id_column]
+    elif descending:
+        order_by = [column.desc(), id_column.desc()]
+    else:
+        order_by = [column, id_column]
+    return stmt.order_by(*order_by)
+
+
+
+@metrics.timed("models.list_entries")
+def list_entries(
+    limit: int,
+    after: tuple | None = None,
+    sort: str = "id",
+    descending: bool = False,
+    category: str | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    name_prefix: str | None = None,
+) -> tuple[list[EntryRow], tuple | None]:
+    stmt = _entries_statement(after, sort, descending, category, min_amount, max_amount, name_prefix)
+    with get_engine().connect() as conn:
+        rows = list(map(EntryRow._make, conn.execute(stmt.limit(limit + 1))))
+    observability.add_rows(len(rows))
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = (getattr(last, SORT_COLUMNS[sort].name), last.id)
+    return rows, next_key
+
+
+
+def iter_entries(
+    after: tuple | None = None,
+    sort: str = "id",
+    descending: bool = False,
+    category: str | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    name_prefix: str | None = None,
+    batch_size: int | None = None,
+) -> Iterator[list[EntryRow]]:
+    # meme filtre et meme ordre que list_entries, sans limite : lu par lots
+    stmt = _entries_statement(after, sort, descending, category, min_amount, max_amount, name_prefix)
+    with get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size or config.EXPORT_BATCH_SIZE).execute(stmt)
+        for partition in result.partitions():
+            observability.add_rows(len(partition))
+            yield list(map(EntryRow._make, partition))
+
+
+
+
+def _is_prefix(terms: list[str], index: int) -> bool:
+    return index == len(terms) - 1 and len(terms[index]) >= SEARCH_PREFIX_MIN
+
+
+
+def _fts_search(conn, terms: list[str], limit: int, offset: int) -> list[EntryRow]:
+    fts = SEARCH_FTS_TABLE
+    # chaque mot est cite : la syntaxe FTS5 (OR, NEAR, colonnes) n'est pas exposee
+    match = " ".join(f'"{term}"*' if _is_prefix(terms, i) else f'"{term}"' for i, term in enumerate(terms))
+    matched = conn.execute(
+        text(f"SELECT count(*) FROM (SELECT 1 FROM {fts} WHERE {fts} MATCH :match LIMIT :cap)"),
+        {"match": match, "cap": SEARCH_RANK_LIMIT + 1},
+    ).scalar()
+    # rank n'est pas selectionne sans classement : bm25 relirait tous les resultats
+    if matched <= SEARCH_RANK_LIMIT:
+        columns, inner_order, outer_order = "rowid AS docid, rank", "rank", "hits.rank"
+    else:
+        columns, inner_order, outer_order = "rowid AS docid", "rowid DESC", "hits.docid DESC"
+    # pagination dans FTS5, jointure sur les seules lignes de la page
+    stmt = text(
+        f"SELECT profile.id, profile.name, profile.amount, profile.category "
+        f"FROM (SELECT {columns} FROM {fts} WHERE {fts} MATCH :match "
+        f"ORDER BY {inner_order} LIMIT :limit OFFSET :offset) AS hits "
+        f"JOIN profile ON profile.rowid = hits.docid ORDER BY {outer_order}"
+    )
+    return list(map(EntryRow._make, conn.execute(stmt, {"match": match, "limit": limit, "offset": offset})))
+
+
+
+def _term_matches(columns, terms: list[str], index: int):
+    # un prefixe devient un intervalle sur la cle primaire (term, entry_id)
+    term = terms[index]
+    if _is_prefix(terms, index):
+        return and_(columns.term >= term, columns.term < term + "\U0010ffff")
+    return columns.term == term
+
+
+
+def _terms_search(conn, terms: list[str], limit: int, offset: int) -> list[EntryRow]:
+    table = search_terms_table
+    counts = [
+        conn.execute(select(func.count()).select_from(
+            select(table.c.entry_id).where(_term_matches(table.c, terms, i)).limit(SEARCH_RANK_LIMIT + 1).subquery()
+        )).scalar()
+        for i in range(len(terms))
+    ]
+    # on parcourt le mot le plus rare ; les autres sont verifies entree par entree
+    driver = counts.index(min(counts))
+    hits = table.alias("hits")
+    candidates = select(hits.c.entry_id, hits.c.term).where(_term_matches(hits.c, terms, driver))
+    scores = []
+    for i in range(len(terms)):
+        other = table.alias(f"t{i}")
+        condition = and_(other.c.entry_id == hits.c.entry_id, _term_matches(other.c, terms, i))
+        if i != driver:
+            candidates = candidates.where(select(other.c.entry_id).where(condition).exists())
+        scores.append(select(func.max(other.c.weight)).where(condition).scalar_subquery())
+    if _is_prefix(terms, driver):
+        # une entree dont plusieurs mots commencent par le prefixe ne sort qu'une fois
+        first = table.alias("first")
+        candidates = candidates.where(~select(first.c.entry_id).where(
+            first.c.entry_id == hits.c.entry_id, _term_matches(first.c, terms, driver), first.c.term < hits.c.term,
+        ).exists())
+
+    if counts[driver] <= SEARCH_RANK_LIMIT:
+        ranked = candidates.add_columns(sum(scores[1:], scores[0]).label("score")).subquery()
+        order_by = [ranked.c.score.desc(), profile_table.c.name, profile_table.c.id]
+    else:
+        # meme repli que FTS5 : ordre de l'index plutot qu'un classement complet
+        ranked = candidates.subquery()
+        order_by = [ranked.c.term, ranked.c.entry_id]
     stmt = (
-        update(profile_table)
-        .where(profile_table.c.id == id.hex)
-        .values(name=name, amount=amount, category=category)
+        select(*ENTRY_COLUMNS)
+        .join(ranked, profile_table.c.id == ranked.c.entry_id)
+        .order_by(*order_by)
+        .limit(limit)
+        .offset(offset)
     )
-    with engine.connect() as conn:
-        conn.execute(stmt)
-        conn.commit()
+    return list(map(EntryRow._make, conn.execute(stmt)))
+
+
+
+@metrics.timed("models.search_entries")
+def search_entries(query: str, limit: int, offset: int = 0) -> tuple[list[EntryRow], int | None]:
+    # tous les mots doivent apparaitre, dans le nom ou la categorie
+    terms = list(dict.fromkeys(search_terms(query)))
+    if not terms:
+        return [], None
+    with get_engine().connect() as conn:
+        search = _fts_search if uses_fts(conn) else _terms_search
+        rows = search(conn, terms, limit + 1, offset)
+    observability.add_rows(len(rows))
+
+    if len(rows) > limit:
+        return rows[:limit], offset + limit
+    return rows, None
+
+
+
+@metrics.timed("models.update_entry")
+def update_entry(id: uuid.UUID, name: str, amount: float, category: str | None) -> None:
+    with transaction() as conn:
+        update_rows(conn, [{"id": id.hex, "name": name, "amount": amount, "category": category}])
         
         
         
 
+@metrics.timed("models.update_entries")
+def update_entries(entries: list[dict]) -> set[str]:
+    rows = [
+        {"id": e["id"].hex, "name": e["name"], "amount": e["amount"], "category": e.get("category")}
+        for e in entries
+    ]
+    with transaction() as conn:
+        return update_rows(conn, rows)
+
+
+
+@metrics.timed("models.delete_entry")
 def delete_entry(id: uuid.UUID) -> None:
-    stmt = delete(profile_table).where(profile_table.c.id == id.hex)
-    with engine.connect() as conn:
-        conn.execute(stmt)
-        conn.commit()
+    with transaction() as conn:
+        delete_rows(conn, [id.hex])
+
+
+
+@metrics.timed("models.delete_entries")
+def delete_entries(ids: list[uuid.UUID]) -> set[str]:
+    with transaction() as conn:
+        return delete_rows(conn, [id.hex for id in ids])
+
+
+
+CHANGE_UPSERT = "upsert"
+CHANGE_DELETE = "delete"
+
+
+
+class Change(NamedTuple):
+    op: str
+    id: str
+    version: int
+    name: str | None = None
+    amount: float | None = None
+    category: str | None = None
+
+
+
+def _changes_statement(columns, table, since: int, after: tuple | None, limit: int):
+    # (version, id) sert de curseur : une transaction ecrit souvent plusieurs lignes
+    version, id = table.c.version, table.c.id
+    if after is None:
+        condition = version > since
+    else:
+        condition = or_(version > after[0], and_(version == after[0], id > after[1]))
+    return select(*columns).where(condition).order_by(version, id).limit(limit)
+
+
+
+@metrics.timed("models.list_changes")
+def list_changes(since: int, limit: int, after: tuple | None = None) -> tuple[list[Change], tuple | None, int]:
+    # lit l'index (version, id) de profile et des suppressions : le cout suit
+    # le nombre de changements, pas la taille de la table
+    upserts = _changes_statement(
+        (literal(CHANGE_UPSERT), profile_table.c.id, profile_table.c.version, *ENTRY_COLUMNS[1:]),
+        profile_table, since, after, limit + 1,
+    )
+    deletes = _changes_statement(
+        (literal(CHANGE_DELETE), tombstones_table.c.id, tombstones_table.c.version),
+        tombstones_table, since, after, limit + 1,
+    )
+    # une seule transaction de lecture : version et changements du meme instantane
+    with get_engine().connect() as conn:
+        current = conn.execute(
+            select(data_version_table.c.version).where(data_version_table.c.name == PROFILE_VERSION)
+        ).scalar() or 0
+        merged = heapq.merge(
+            itertools.starmap(Change, conn.execute(upserts)),
+            itertools.starmap(Change, conn.execute(deletes)),
+            key=lambda change: (change.version, change.id),
+        )
+        changes = list(itertools.islice(merged, limit + 1))
+    observability.add_rows(len(changes))
+
+    next_key = None
+    if len(changes) > limit:
+        changes = changes[:limit]
+        next_key = (changes[-1].version, changes[-1].id)
+    return changes, next_key, current
+
+
+
+@metrics.timed("models.category_summary")
+def category_summary() -> list[dict]:
+    # lecture de la table d'agregats : O(categories) et non O(entrees), donc
+    # pas de cache en memoire qui pourrait servir un resume anterieur a une ecriture
+    totals = category_totals_table.c
+    stmt = select(category_totals_table).where(totals.count > 0).order_by(totals.category)
+    with get_engine().connect() as conn:
+        summary = [
+            {
+                "category": row.category or None,
+                "count": row.count,
+                "total": row.total,
+                "min": row.min,
+                "max": row.max,
+                "average": row.total / row.count,
+            }
+            for row in conn.execute(stmt)
+        ]
+    observability.add_rows(len(summary))
+    return summary
+
 
 
+@metrics.timed("models.rebuild_totals")
+def rebuild_totals() -> list[tuple[str | None, dict | None, dict | None]]:
+    with transaction() as conn:
+        differences = refresh_category_totals(conn)
+    return differences
@@ -0,0 +1,77 @@
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+logger = logging.getLogger("archilog.requests")
+
+
+
+@dataclass
+class RequestStats:
+    started: float
+    db_time: float = 0.0
+    queries: int = 0
+    rows: int = 0
+
+    @property
+    def total_time(self) -> float:
+        return time.perf_counter() - self.started
+
+
+
+_current_stats: ContextVar[RequestStats | None] = ContextVar("archilog_request_stats", default=None)
+
+
+
+def start_request():
+    return _current_stats.set(RequestStats(started=time.perf_counter()))
+
+
+
+def end_request(token) -> RequestStats | None:
+    stats = _current_stats.get()
+    _current_stats.reset(token)
+    return stats
+
+
+
+def current_stats() -> RequestStats | None:
+    return _current_stats.get()
+
+
+
+def add_rows(count: int) -> None:
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.rows += count
+
+
+
+def log_request(route: str, method: str, status: int, stats: RequestStats) -> None:
+    logger.info(
+        "route=%s method=%s status=%d db_ms=%.2f queries=%d rows=%d total_ms=%.2f",
+        route, method, status, stats.db_time * 1000, stats.queries, stats.rows, stats.total_time * 1000,
+    )
+
+
+
+def instrument_engine(engine) -> None:
+    # hors requete HTTP (CLI, imports en tache de fond) le cout se limite
+    # a la lecture d'une ContextVar
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_stats.get() is not None:
+            conn.info.setdefault("archilog_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        if stats is None or not conn.info.get("archilog_query_start"):
+            return
+        stats.db_time += time.perf_counter() - conn.info["archilog_query_start"].pop()
+        stats.queries += 1
+        if cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
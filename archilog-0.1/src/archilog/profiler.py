@@ -0,0 +1,69 @@
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+
+def _stack(frame) -> str:
+    # format "folded" (flamegraph.pl, speedscope, inferno) : racine d'abord
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+
+class SamplingProfiler:
+    # un thread echantillonne la pile des seuls threads qui traitent une
+    # requete ; il n'est demarre que si le profilage est active
+    def __init__(self, interval: float, directory: str):
+        self.interval = interval
+        self.directory = directory
+        self._active: dict[int, collections.Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="archilog-profiler", daemon=True)
+                self._thread.start()
+
+    def begin(self, thread_id: int) -> None:
+        with self._lock:
+            self._active[thread_id] = collections.Counter()
+
+    def end(self, thread_id: int) -> collections.Counter:
+        with self._lock:
+            return self._active.pop(thread_id, collections.Counter())
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        samples[_stack(frame)] += 1
+
+    def dump(self, samples: collections.Counter, label: str, elapsed: float) -> str | None:
+        if not samples:
+            return None
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{name}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("Requete lente (%.0f ms), profil ecrit dans %s", elapsed * 1000, path)
+        return path
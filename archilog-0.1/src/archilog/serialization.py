@@ -0,0 +1,81 @@
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+from archilog import config
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le module json
+    orjson = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+
+def use_orjson() -> bool:
+    if config.JSON_BACKEND == "json":
+        return False
+    if config.JSON_BACKEND == "orjson" and orjson is None:
+        raise RuntimeError("ARCHILOG_JSON_BACKEND=orjson mais orjson n'est pas installé")
+    return orjson is not None
+
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # orjson pour jsonify quand il est installe ; les types qu'il ne gere pas
+    # comme Flask (dates, dataclasses) repassent par DefaultJSONProvider.default
+    fast = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.fast = use_orjson()
+
+    def _options(self) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not self.fast or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if not self.fast or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.fast or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+
+def dumps(obj: Any) -> bytes:
+    if use_orjson():
+        return orjson.dumps(obj)
+    return _encoder.encode(obj).encode()
+
+
+
+def ndjson_lines(rows: Iterable) -> bytes:
+    # une ligne JSON par entree
+    if use_orjson():
+        return b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+    return "".join(_encoder.encode(row._asdict()) + "\n" for row in rows).encode()
+
+
+
+def iter_ndjson(batches: Iterable[list]) -> Iterator[bytes]:
+    # un morceau de reponse par lot lu en base
+    for rows in batches:
+        yield ndjson_lines(rows)
@@ -1,49 +1,350 @@
 import csv
+import hashlib
 import io
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 
-from archilog.models import Entry, create_entry, get_all_entries
+import archilog.models as models
+from archilog import config, metrics
 
+BEST_EFFORT = "best-effort"
+ALL_OR_NOTHING = "all-or-nothing"
+IMPORT_MODES = (BEST_EFFORT, ALL_OR_NOTHING)
 
-def import_from_csv(csv_file: io.BytesIO) -> None:
+# upsert : une ligne dont la cle existe deja met a jour l'entree au lieu d'en creer une
+UPSERT_ID = "id"
+UPSERT_NATURAL = "natural"
+UPSERT_KEYS = (UPSERT_ID, UPSERT_NATURAL)
+
+EXPORT_FIELDS = ["name", "amount", "category"]
+
+logger = logging.getLogger(__name__)
+
+
+
+@dataclass
+class RowError:
+    line: int
+    message: str
+    row: dict
+
+
+
+@dataclass
+class ImportReport:
+    mode: str
+    rows_read: int = 0
+    rows_imported: int = 0
+    rows_updated: int = 0
+    rows_unchanged: int = 0
+    duplicates: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self, max_errors: int = 100) -> dict:
+        return {
+            "mode": self.mode,
+            "rows_read": self.rows_read,
+            "rows_imported": self.rows_imported,
+            "rows_updated": self.rows_updated,
+            "rows_unchanged": self.rows_unchanged,
+            "duplicates": self.duplicates,
+            "error_count": len(self.errors),
+            "errors": [
+                {"line": e.line, "message": e.message, "row": e.row}
+                for e in self.errors[:max_errors]
+            ],
+            "elapsed": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+
+class ImportAborted(Exception):
+    pass
+
+
+
+def _parse_row(line: int, row: dict, keep_ids: bool = False) -> tuple[dict | None, RowError | None]:
+    name = row.get("name")
+    amount = row.get("amount")
+    category = row.get("category") or None
+
+    if not name or not amount:
+        return None, RowError(line, "Ligne invalide : nom ou montant manquant", row)
     try:
-       
-        csv_reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding='utf-8'))
-        
-        for row in csv_reader:
-            name = row.get("name")
-            amount = row.get("amount")
-            category = row.get("category")
-            
-            if name and amount: 
-                try:
-                    amount = float(amount)  
-                    create_entry(name, amount, category)  
-                except ValueError:
-                    print(f"Erreur : Montant invalide pour {row}")
+        amount = float(amount)
+    except ValueError:
+        return None, RowError(line, f"Montant invalide : {amount!r}", row)
+
+    # l'id du fichier n'est repris qu'en upsert par id, sinon chaque ligne est nouvelle
+    id = uuid.uuid4().hex
+    if keep_ids and row.get("id"):
+        try:
+            id = uuid.UUID(row["id"]).hex
+        except ValueError:
+            return None, RowError(line, f"ID invalide : {row['id']!r}", row)
+
+    return {"id": id, "name": name, "amount": amount, "category": category}, None
+
+
+
+def _check_chunk(chunk, keep_ids: bool = False) -> tuple[list[dict], list[RowError]]:
+    valid, errors = [], []
+    for line, row in chunk:
+        parsed, error = _parse_row(line, row, keep_ids)
+        if error:
+            errors.append(error)
+        else:
+            valid.append(parsed)
+    return valid, errors
+
+
+
+def _upsert_key(upsert: str | None) -> tuple[str, ...] | None:
+    if upsert is None:
+        return None
+    if upsert == UPSERT_ID:
+        return ("id",)
+    if upsert == UPSERT_NATURAL:
+        key = config.IMPORT_NATURAL_KEY
+        if not key or any(column not in models.NATURAL_KEY_COLUMNS for column in key):
+            raise ValueError(f"ARCHILOG_IMPORT_NATURAL_KEY invalide : {','.join(key)}")
+        return key
+    raise ValueError(f"Cle d'upsert inconnue : {upsert}")
+
+
+
+def _drop_duplicates(rows: list[dict], key: tuple[str, ...], seen: set, report: ImportReport) -> list[dict]:
+    # empreintes de 16 octets plutot que les cles : memoire bornee sur un gros fichier
+    unique = []
+    for row in rows:
+        if key == ("id",):
+            digest = bytes.fromhex(row["id"])
+        else:
+            digest = hashlib.blake2b(repr(models.natural_key(row, key)).encode(), digest_size=16).digest()
+        if digest in seen:
+            report.duplicates += 1
+        else:
+            seen.add(digest)
+            unique.append(row)
+    return unique
+
+
+
+def _write_rows(conn, rows: list[dict], key: tuple[str, ...] | None, seen: set, report: ImportReport) -> int:
+    if key is None:
+        models.insert_rows(conn, rows)
+        return len(rows)
+    # la premiere occurrence d'une cle dans le fichier l'emporte
+    rows = _drop_duplicates(rows, key, seen, report)
+    inserted, updated = models.upsert_rows(conn, rows, key)
+    report.rows_updated += updated
+    report.rows_unchanged += len(rows) - inserted - updated
+    return inserted + updated
+
+
+
+def _write_batches(
+    batches: Iterable[tuple[int, list[dict], list[RowError]]],
+    mode: str,
+    progress: Callable[[ImportReport], None] | None,
+    upsert: str | None = None,
+) -> ImportReport:
+    # batches : (lignes lues, lignes valides, erreurs), dans l'ordre du fichier
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Mode d'import inconnu : {mode}")
+    key = _upsert_key(upsert)
+    seen = set()
+
+    report = ImportReport(mode=mode)
+    start = time.perf_counter()
+
+    try:
+        if mode == ALL_OR_NOTHING:
+            # une seule transaction : la moindre erreur annule tout l'import
+            with models.transaction() as conn:
+                pending = 0
+                for read, valid, errors in batches:
+                    report.rows_read += read
+                    report.errors.extend(errors)
+                    if not report.errors:
+                        pending += _write_rows(conn, valid, key, seen, report)
+                    if progress:
+                        report.elapsed = time.perf_counter() - start
+                        progress(report)
+                if report.errors:
+                    raise ImportAborted()
+            report.rows_imported = pending
+        else:
+            for read, valid, errors in batches:
+                report.rows_read += read
+                report.errors.extend(errors)
+                with models.transaction() as conn:
+                    report.rows_imported += _write_rows(conn, valid, key, seen, report)
+                if progress:
+                    report.elapsed = time.perf_counter() - start
+                    progress(report)
+    except ImportAborted:
+        report.rows_updated = report.rows_unchanged = 0
+    finally:
+        report.elapsed = time.perf_counter() - start
+
+    logger.info(
+        "Import CSV (%s) : %d lignes lues, %d importees dont %d mises a jour, %d doublons, %d erreurs, %.0f lignes/s",
+        mode, report.rows_read, report.rows_imported, report.rows_updated, report.duplicates, len(report.errors),
+        report.rows_per_second,
+    )
+    return report
+
+
+
+@metrics.timed("services.import_from_csv")
+def import_from_csv(
+    csv_file: io.BufferedIOBase,
+    batch_size: int | None = None,
+    mode: str = BEST_EFFORT,
+    progress: Callable[[ImportReport], None] | None = None,
+    upsert: str | None = None,
+) -> ImportReport:
+    batch_size = batch_size or config.IMPORT_BATCH_SIZE
+    keep_ids = upsert == UPSERT_ID
+
+    csv_reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding="utf-8", newline=""))
+    rows = ((csv_reader.line_num, row) for row in csv_reader)
+
+    def batches():
+        while chunk := list(itertools.islice(rows, batch_size)):
+            yield len(chunk), *_check_chunk(chunk, keep_ids)
+
+    return _write_batches(batches(), mode, progress, upsert)
+
+
+
+def _split_file(path: str, chunk_bytes: int) -> tuple[list[str], int, list[tuple[int, int]]]:
+    # decoupage en plages d'octets alignees sur les fins de ligne
+    with open(path, "rb") as f:
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode("utf-8")]), [])
+        size = os.fstat(f.fileno()).st_size
+        ranges = []
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return fieldnames, header.count(b"\n"), ranges
+
+
+
+def _parse_range(
+    path: str, start: int, end: int, fieldnames: list[str], keep_ids: bool = False,
+) -> tuple[int, list[dict], list[RowError], int]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    csv_reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames=fieldnames)
+    chunk = [(csv_reader.line_num, row) for row in csv_reader]
+    valid, errors = _check_chunk(chunk, keep_ids)
+    # numeros de ligne relatifs a la plage : recales par le processus principal
+    return len(chunk), valid, errors, data.count(b"\n")
+
+
+
+def _parallel_batches(path: str, batch_size: int, workers: int, chunk_bytes: int, keep_ids: bool = False):
+    fieldnames, line_offset, ranges = _split_file(path, chunk_bytes)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        # au plus 2 plages en avance par worker : memoire bornee si l'ecriture est plus lente
+        in_flight = deque()
+        remaining = iter(ranges)
+        for start, end in itertools.islice(remaining, workers * 2):
+            in_flight.append(executor.submit(_parse_range, path, start, end, fieldnames, keep_ids))
+
+        while in_flight:
+            read, valid, errors, lines = in_flight.popleft().result()
+            for start, end in itertools.islice(remaining, 1):
+                in_flight.append(executor.submit(_parse_range, path, start, end, fieldnames, keep_ids))
+
+            errors = [RowError(line_offset + e.line, e.message, e.row) for e in errors]
+            line_offset += lines
+            if not valid:
+                yield read, [], errors
+            for i in range(0, len(valid), batch_size):
+                yield (read, valid[i:i + batch_size], errors) if i == 0 else (0, valid[i:i + batch_size], [])
+
+
+
+@metrics.timed("services.import_csv_file")
+def import_csv_file(
+    path: str,
+    batch_size: int | None = None,
+    mode: str = BEST_EFFORT,
+    progress: Callable[[ImportReport], None] | None = None,
+    workers: int | None = None,
+    upsert: str | None = None,
+) -> ImportReport:
+    # l'analyse parallele suppose qu'aucun champ entre guillemets ne contient de saut de ligne
+    workers = workers or config.IMPORT_PARSE_WORKERS
+    if workers <= 1:
+        with open(path, "rb") as f:
+            return import_from_csv(f, batch_size, mode, progress, upsert)
+
+    batch_size = batch_size or config.IMPORT_BATCH_SIZE
+    chunk_bytes = config.IMPORT_PARSE_CHUNK_BYTES
+    batches = _parallel_batches(path, batch_size, workers, chunk_bytes, upsert == UPSERT_ID)
+    return _write_batches(batches, mode, progress, upsert)
+
+
+
+
+
+def iter_csv_export(batch_size: int | None = None, with_ids: bool = False) -> Iterator[str]:
+    # avec les id, le fichier peut etre reimporte en upsert par id sans doublon
+    buffer = io.StringIO()
+    csv_writer = csv.writer(buffer)
+    csv_writer.writerow(["id", *EXPORT_FIELDS] if with_ids else EXPORT_FIELDS)
+
+    try:
+        for rows in models.iter_entry_batches(batch_size):
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if with_ids:
+                csv_writer.writerows(rows)
             else:
-                print(f"Erreur : Ligne invalide dans le CSV {row}")
-    except Exception as e:
-        print(f"Erreur lors de l'importation du CSV : {str(e)}")
-        
-        
-        
-        
-      
-def export_to_csv() -> io.StringIO:
+                csv_writer.writerows((row.name, row.amount, row.category) for row in rows)
+    except Exception:
+        # en reponse HTTP les en-tetes sont deja partis : l'erreur est
+        # journalisee et la connexion coupee plutot qu'un fichier tronque
+        logger.exception("Export CSV interrompu")
+        raise
+
+    yield buffer.getvalue()
+
+
+
+@metrics.timed("services.export_to_csv")
+def export_to_csv(with_ids: bool = False) -> io.StringIO:
     output = io.StringIO()
-    csv_writer = csv.DictWriter(
-        output, fieldnames=["name", "amount", "category"]
-    )
-    csv_writer.writeheader()
-
-    entries = get_all_entries()
-    for entry in entries:
-        if isinstance(entry, Entry):
-            entry_dict = {
-                "name": entry.name,
-                "amount": entry.amount,
-                "category": entry.category
-            }
-            csv_writer.writerow(entry_dict)
-    
-    return output
\ No newline at end of file
+    for chunk in iter_csv_export(with_ids=with_ids):
+        output.write(chunk)
+    return output
@@ -1,19 +1,75 @@
-from flask import Flask
+from archilog import config, setup_logging
 
-from archilog.__init__ import config
-from archilog.views.api import api_views, register_spec
-from archilog.views.web_ui import register_error_handlers, web_ui_bp
+# Flask, spectree, pydantic et WTForms ne sont importes que par create_app :
+# les commandes de archilog.views.cmd n'en paient pas le cout au demarrage
 
 
 def create_app():
+    from flask import Flask
+
+    from archilog.serialization import FastJSONProvider
+    from archilog.views.api import api_views, register_spec
+    from archilog.views.web_ui import register_error_handlers, web_ui_bp
+
+    setup_logging()
+
     app = Flask(__name__)
-    
-    app.config['SECRET_KEY'] = config.SECRET_KEY 
+    app.json = FastJSONProvider(app)
+
+    app.config['SECRET_KEY'] = config.SECRET_KEY
 
-    register_error_handlers(app)  
+    register_error_handlers(app)
     register_spec(app)
-   
+    if config.LOG_REQUESTS or config.METRICS_ENABLED or config.PROFILE_SLOW_MS > 0:
+        register_request_timing(app)
+
     app.register_blueprint(web_ui_bp)
-    app.register_blueprint(api_views) 
+    app.register_blueprint(api_views)
+    if config.METRICS_ENABLED:
+        from archilog.views.metrics import metrics_bp
+
+        app.register_blueprint(metrics_bp)
 
     return app
+
+
+
+def register_request_timing(app):
+    import threading
+
+    from flask import g, request
+
+    from archilog import observability
+    from archilog.views.common import record_request
+
+    profiler = None
+    if config.PROFILE_SLOW_MS > 0:
+        from archilog.profiler import SamplingProfiler
+
+        profiler = SamplingProfiler(config.PROFILE_INTERVAL_MS / 1000, config.PROFILE_DIR)
+        profiler.start()
+
+    @app.before_request
+    def start_timing():
+        g.request_stats_token = observability.start_request()
+        if profiler is not None:
+            profiler.begin(threading.get_ident())
+
+    @app.after_request
+    def log_timing(response):
+        stats = observability.current_stats()
+        if stats is not None:
+            route = request.url_rule.rule if request.url_rule else None
+            record_request(route, request.path, request.method, response.status_code, stats)
+        return response
+
+    @app.teardown_request
+    def stop_timing(error=None):
+        token = g.pop("request_stats_token", None)
+        if token is None:
+            return
+        stats = observability.end_request(token)
+        if profiler is not None:
+            samples = profiler.end(threading.get_ident())
+            if stats is not None and stats.total_time * 1000 >= config.PROFILE_SLOW_MS:
+                profiler.dump(samples, f"{request.method} {request.path}", stats.total_time)
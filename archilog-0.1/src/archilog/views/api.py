@@ -1,12 +1,20 @@
+import os
 import uuid
+from datetime import datetime
+from typing import Literal
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
 from flask_httpauth import HTTPTokenAuth
 from pydantic import BaseModel, Field
 from spectree import BaseFile, SecurityScheme, SpecTree
 
+import archilog.analytics as analytics
+import archilog.auth as auth
+import archilog.jobs as jobs
 import archilog.models as models
+import archilog.serialization as serialization
 import archilog.services as services
+from archilog.views import common
 
 api_views = Blueprint("api_views", __name__, url_prefix="/api/users")
 
@@ -27,18 +35,9 @@ token_auth = HTTPTokenAuth(scheme='Bearer')
 
 
 
-valid_tokens = {
-    "admin_token": "admin",  
-    "user_token": "user"     
-}
-
-
-
 @token_auth.verify_token
 def verify_token(token):
-    if token in valid_tokens:
-        return valid_tokens[token] 
-    return None
+    return auth.check_token(token)
 
 
 
@@ -52,30 +51,105 @@ class EntryResponse(EntryModel):
     id: str
 
 
+BATCH_MAX_SIZE = 5000
+
+
+class EntryBatch(BaseModel):
+    entries: list[EntryModel] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class EntryUpdateModel(EntryModel):
+    id: str = Field(description="UUID de l'entrée à modifier")
+
+
+class EntryUpdateBatch(BaseModel):
+    entries: list[EntryUpdateModel] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class EntryIdBatch(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class EntriesQuery(BaseModel):
+    limit: int = Field(default=100, ge=1, le=1000, description="Nombre maximal d'entrées par page")
+    cursor: str | None = Field(default=None, description="Curseur opaque renvoyé dans `next`")
+    sort: Literal["id", "name", "amount"] = Field(default="id", description="Colonne de tri")
+    order: Literal["asc", "desc"] = Field(default="asc", description="Sens du tri")
+    category: str | None = Field(default=None, description="Filtrer sur une catégorie")
+    min_amount: float | None = Field(default=None, description="Montant minimal")
+    max_amount: float | None = Field(default=None, description="Montant maximal")
+    name_prefix: str | None = Field(default=None, max_length=100, description="Préfixe du nom, sensible à la casse")
+
+
+class SearchQuery(BaseModel):
+    q: str = Field(min_length=1, max_length=200, description="Mots cherchés dans le nom et la catégorie")
+    limit: int = Field(default=20, ge=1, le=1000, description="Nombre maximal de résultats par page")
+    offset: int = Field(default=0, ge=0, description="Position renvoyée dans `next_offset`")
+
+
+class ChangesQuery(BaseModel):
+    since: int = Field(default=0, ge=0, description="Dernière `version` reçue (0 : tout l'historique)")
+    limit: int = Field(default=1000, ge=1, le=5000, description="Nombre maximal de changements par page")
+    cursor: str | None = Field(default=None, description="Curseur opaque renvoyé dans `next`")
+
+
+class ExportQuery(BaseModel):
+    with_ids: bool = Field(default=False, description="Inclure la colonne id (réimport en upsert sans doublon)")
+
+
+class StatsQuery(BaseModel):
+    bins: int = Field(default=20, ge=1, le=1000, description="Nombre de classes de l'histogramme")
+
+
 class CSVFileUpload(BaseModel):
     file: BaseFile 
     
     
 
 @api_views.route('/entries', methods=['GET'])
-@spec.validate(tags=["entries"])
+@spec.validate(query=EntriesQuery, tags=["entries"])
 @token_auth.login_required
-def get_entries():
+def get_entries(query: EntriesQuery):
     current_user = token_auth.current_user()  
 
     if current_user != "admin":
-        return jsonify({"error": "Accès refusé. Vous devez être admin."}), 403
-
-    entries = models.get_all_entries()
-    return jsonify([
-        {
-            'id': entry.id.hex,
-            'name': entry.name,
-            'amount': entry.amount,
-            'category': entry.category
-        }
-        for entry in entries
-    ])
+        return jsonify(common.FORBIDDEN), 403
+
+    ndjson = request.accept_mimetypes.best_match(["application/json", serialization.NDJSON_MIMETYPE]) == serialization.NDJSON_MIMETYPE
+    etag, last_modified = _validators("ndjson" if ndjson else "json")
+    if _not_modified(etag):
+        return _conditional(Response(status=304), etag, last_modified)
+
+    descending = query.order == "desc"
+    try:
+        after = models.decode_cursor(query.cursor, query.sort, descending) if query.cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filters = dict(
+        after=after,
+        sort=query.sort,
+        descending=descending,
+        category=query.category,
+        min_amount=query.min_amount,
+        max_amount=query.max_amount,
+        name_prefix=query.name_prefix,
+    )
+
+    # NDJSON : toutes les entrees filtrees, ecrites au fil du curseur (limit ignore)
+    if ndjson:
+        response = Response(
+            stream_with_context(serialization.iter_ndjson(models.iter_entries(**filters))),
+            mimetype=serialization.NDJSON_MIMETYPE,
+        )
+    else:
+        rows, next_key = models.list_entries(query.limit, **filters)
+        response = jsonify({
+            'entries': [row._asdict() for row in rows],
+            'next': models.encode_cursor(query.sort, descending, next_key) if next_key else None,
+        })
+    response.vary.add("Accept")
+    return _conditional(response, etag, last_modified)
 
 
 
@@ -86,7 +160,7 @@ def create_entry(json: EntryModel):
     current_user = token_auth.current_user()  
 
     if current_user != "admin":
-        return jsonify({"error": "Accès refusé. Vous devez être admin."}), 403
+        return jsonify(common.FORBIDDEN), 403
    
     entry = models.create_entry(json.name, json.amount, json.category)
     
@@ -100,6 +174,157 @@ def create_entry(json: EntryModel):
 
 
 
+@api_views.route('/entries/search', methods=['GET'])
+@spec.validate(query=SearchQuery, tags=["entries"])
+@token_auth.login_required
+def search_entries(query: SearchQuery):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    etag, last_modified = _validators("search")
+    if _not_modified(etag):
+        return _conditional(Response(status=304), etag, last_modified)
+
+    rows, next_offset = models.search_entries(query.q, query.limit, query.offset)
+    return _conditional(jsonify({
+        'entries': [row._asdict() for row in rows],
+        'next_offset': next_offset,
+    }), etag, last_modified)
+
+
+
+@api_views.route('/entries/changes', methods=['GET'])
+@spec.validate(query=ChangesQuery, tags=["entries"])
+@token_auth.login_required
+def get_changes(query: ChangesQuery):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    etag, last_modified = _validators("changes")
+    if _not_modified(etag):
+        return _conditional(Response(status=304), etag, last_modified)
+
+    try:
+        after = models.decode_cursor(query.cursor, "version", False) if query.cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # suivre `next` jusqu'a null, puis repartir de `version` au prochain appel
+    changes, next_key, version = models.list_changes(query.since, query.limit, after)
+    return _conditional(jsonify({
+        'changes': [
+            change._asdict() if change.op == models.CHANGE_UPSERT else {
+                'op': change.op, 'id': change.id, 'version': change.version,
+            }
+            for change in changes
+        ],
+        'next': models.encode_cursor("version", False, next_key) if next_key else None,
+        'version': version,
+    }), etag, last_modified)
+
+
+
+def _validators(*variant) -> tuple[str, datetime]:
+    # version lue avant les donnees : une ecriture concurrente donne au pire
+    # des donnees plus recentes que l'ETag, jamais l'inverse
+    return common.validators(*models.data_version(), *variant)
+
+
+
+def _not_modified(etag: str) -> bool:
+    return common.not_modified(request.headers.get("If-None-Match"), etag)
+
+
+
+def _conditional(response: Response, etag: str, last_modified: datetime) -> Response:
+    response.headers.update(common.cache_headers(etag, last_modified))
+    return response
+
+
+
+def _parse_uuid(value: str) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+
+
+@api_views.route('/entries:batch', methods=['POST'])
+@spec.validate(json=EntryBatch, tags=["entries"])
+@token_auth.login_required
+def create_entries_batch(json: EntryBatch):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    created = models.create_entries([entry.model_dump() for entry in json.entries])
+    return jsonify({
+        'results': [
+            {'index': index, 'status': 'created', **entry}
+            for index, entry in enumerate(created)
+        ]
+    }), 201
+
+
+
+@api_views.route('/entries:batch', methods=['PUT'])
+@spec.validate(json=EntryUpdateBatch, tags=["entries"])
+@token_auth.login_required
+def update_entries_batch(json: EntryUpdateBatch):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    parsed = [(entry, _parse_uuid(entry.id)) for entry in json.entries]
+    updated = models.update_entries([
+        {'id': uuid_id, 'name': entry.name, 'amount': entry.amount, 'category': entry.category}
+        for entry, uuid_id in parsed if uuid_id is not None
+    ])
+
+    results = []
+    for index, (entry, uuid_id) in enumerate(parsed):
+        if uuid_id is None:
+            results.append({'index': index, 'id': entry.id, 'status': 'invalid_id'})
+        elif uuid_id.hex in updated:
+            results.append({'index': index, 'id': uuid_id.hex, 'status': 'updated'})
+        else:
+            results.append({'index': index, 'id': uuid_id.hex, 'status': 'not_found'})
+    return jsonify({'results': results}), 200
+
+
+
+# DELETE n'a pas de corps valide par SpecTree : suppression en lot via POST
+@api_views.route('/entries:batchDelete', methods=['POST'])
+@spec.validate(json=EntryIdBatch, tags=["entries"])
+@token_auth.login_required
+def delete_entries_batch(json: EntryIdBatch):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    parsed = [(id, _parse_uuid(id)) for id in json.ids]
+    deleted = models.delete_entries([uuid_id for _, uuid_id in parsed if uuid_id is not None])
+
+    results = []
+    for index, (id, uuid_id) in enumerate(parsed):
+        if uuid_id is None:
+            results.append({'index': index, 'id': id, 'status': 'invalid_id'})
+        elif uuid_id.hex in deleted:
+            results.append({'index': index, 'id': uuid_id.hex, 'status': 'deleted'})
+        else:
+            results.append({'index': index, 'id': uuid_id.hex, 'status': 'not_found'})
+    return jsonify({'results': results}), 200
+
+
+
 @api_views.route('/entries/<id>', methods=['GET'])
 @spec.validate(tags=["entries"])
 @token_auth.login_required
@@ -107,21 +332,28 @@ def get_entry(id: str):
     current_user = token_auth.current_user()
 
     if current_user != "admin":
-        return jsonify({"error": "Accès refusé. Vous devez être admin."}), 403
-
+        return jsonify(common.FORBIDDEN), 403
+
+    uuid_id = _parse_uuid(id)
+    if uuid_id is None:
+        return jsonify(common.INVALID_ID), 400
+
+    # le corps est lu pour la version de l'ETag : une entree mise en cache
+    # avant une ecriture (de ce processus ou d'un autre) est relue
+    version, updated_at = models.data_version()
+    etag, last_modified = common.validators(version, updated_at)
+    if _not_modified(etag):
+        return _conditional(Response(status=304), etag, last_modified)
     try:
-        uuid_id = uuid.UUID(id)
-        entry = models.get_entry(uuid_id)
-        if not entry:
-            return jsonify({"error": "Entrée introuvable"}), 404
-        return jsonify({
-            'id': entry.id.hex,
-            'name': entry.name,
-            'amount': entry.amount,
-            'category': entry.category
-        }), 200
-    except ValueError:
-        return jsonify({"error": "ID invalide, le format UUID attendu"}), 400
+        entry = models.get_entry(uuid_id, version)
+    except Exception:
+        return jsonify(common.NOT_FOUND), 404
+    return _conditional(jsonify({
+        'id': entry.id.hex,
+        'name': entry.name,
+        'amount': entry.amount,
+        'category': entry.category
+    }), etag, last_modified)
 
 
 
@@ -132,7 +364,7 @@ def update_entry(id: str, json: EntryModel):
     current_user = token_auth.current_user()  
 
     if current_user != "admin":
-        return jsonify({"error": "Accès refusé. Vous devez être admin."}), 403
+        return jsonify(common.FORBIDDEN), 403
 
     try:
         uuid_id = uuid.UUID(id)
@@ -144,7 +376,7 @@ def update_entry(id: str, json: EntryModel):
             'category': json.category
         }), 200
     except ValueError:
-        return jsonify({"error": "ID invalide, le format UUID attendu"}), 400
+        return jsonify(common.INVALID_ID), 400
 
 
 
@@ -156,27 +388,69 @@ def delete_entry(id: str):
     current_user = token_auth.current_user()  
 
     if current_user != "admin":
-        return jsonify({"error": "Accès refusé. Vous devez être admin."}), 403
+        return jsonify(common.FORBIDDEN), 403
 
     try:
         uuid_id = uuid.UUID(id)
         models.delete_entry(uuid_id)
         return jsonify({"message": "Entrée supprimée avec succès"}), 204
     except ValueError:
-        return jsonify({"error": "ID invalide, le format UUID attendu"}), 400
+        return jsonify(common.INVALID_ID), 400
+
+
+
+@api_views.route('/reports/summary', methods=['GET'])
+@spec.validate(tags=["reports"])
+@token_auth.login_required
+def report_summary():
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    return jsonify({"categories": models.category_summary()}), 200
+
+
+
+@api_views.route('/reports/stats', methods=['GET'])
+@spec.validate(query=StatsQuery, tags=["reports"])
+@token_auth.login_required
+def report_stats(query: StatsQuery):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    return jsonify(analytics.compute_stats(bins=query.bins)), 200
+
+
+
+@api_views.route('/cache/stats', methods=['GET'])
+@spec.validate(tags=["monitoring"])
+@token_auth.login_required
+def cache_stats():
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    return jsonify({"entries": models.entry_cache.info()}), 200
 
 
 
 @api_views.route('/export', methods=['GET'])
-@spec.validate(tags=["import-export"])
+@spec.validate(query=ExportQuery, tags=["import-export"])
 @token_auth.login_required
-def export_csv():
-    
-    csv_content = services.export_to_csv().getvalue()
-    return csv_content, 200, {
-        'Content-Type': 'text/csv',
-        'Content-Disposition': 'attachment; filename=entries.csv'
-    }
+def export_csv(query: ExportQuery):
+    etag, last_modified = _validators("csv-ids" if query.with_ids else "csv")
+    if _not_modified(etag):
+        return _conditional(Response(status=304), etag, last_modified)
+
+    return _conditional(Response(
+        stream_with_context(services.iter_csv_export(with_ids=query.with_ids)),
+        mimetype="text/csv",
+        headers={'Content-Disposition': 'attachment; filename=entries.csv'}
+    ), etag, last_modified)
     
     
 
@@ -190,7 +464,7 @@ def import_csv_api():
     current_user = token_auth.current_user()  
 
     if current_user != "admin":
-        return jsonify({"error": "Accès refusé. Vous devez être admin."}), 403
+        return jsonify(common.FORBIDDEN), 403
 
     try:
 
@@ -199,12 +473,46 @@ def import_csv_api():
         if not file:
             return jsonify({"error": "Fichier manquant"}), 400
 
-        services.import_from_csv(file.stream)
-        return jsonify({"message": "Import réussi"}), 200
+        mode = request.form.get("mode", services.BEST_EFFORT)
+        if mode not in services.IMPORT_MODES:
+            return jsonify({"error": f"Mode invalide, valeurs possibles : {', '.join(services.IMPORT_MODES)}"}), 400
+
+        upsert = request.form.get("upsert") or None
+        if upsert is not None and upsert not in services.UPSERT_KEYS:
+            return jsonify({"error": f"Upsert invalide, valeurs possibles : {', '.join(services.UPSERT_KEYS)}"}), 400
+
+        path = jobs.spool_upload(file)
+        try:
+            job = jobs.runner.submit(path, file.filename, mode=mode, upsert=upsert)
+        except jobs.JobQueueFull as e:
+            os.remove(path)
+            return jsonify({"error": str(e)}), 503
+
+        return jsonify({
+            "message": "Import en cours",
+            "job_id": job.id,
+            "status_url": url_for("api_views.get_import_job", job_id=job.id),
+        }), 202
     except Exception:
         return jsonify({"error": "Erreur lors de l'import"}), 500
 
 
 
+@api_views.route("/import_jobs/<job_id>", methods=["GET"])
+@spec.validate(tags=["import-export"])
+@token_auth.login_required
+def get_import_job(job_id: str):
+    current_user = token_auth.current_user()
+
+    if current_user != "admin":
+        return jsonify(common.FORBIDDEN), 403
+
+    job = jobs.runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "Import introuvable"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+
 def register_spec(app):
     spec.register(app)
@@ -0,0 +1,251 @@
+import json
+import uuid
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from pydantic import ValidationError
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import archilog.async_models as async_models
+import archilog.models as models
+import archilog.serialization as serialization
+from archilog import config, observability
+from archilog.views import common, create_app
+from archilog.views.api import EntriesQuery, EntryModel
+
+# routes CRUD de /api/users servies en asynchrone ; tout le reste (interface
+# web, lots, imports, rapports, apidoc) est delegue a l'application Flask
+PREFIX = "/api/users/entries"
+ITEM_ROUTE = PREFIX + "/<id>"
+
+
+
+class Request:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        self.query = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+
+    async def body(self) -> bytes:
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+
+
+async def _send_response(send, status: int, body: bytes = b"", content_type: str | None = None, headers: dict | None = None):
+    raw_headers = [(k.lower().encode(), str(v).encode()) for k, v in (headers or {}).items()]
+    if content_type:
+        raw_headers.append((b"content-type", content_type.encode()))
+    raw_headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+
+async def _send_json(send, status: int, data, headers: dict | None = None):
+    await _send_response(send, status, serialization.dumps(data), "application/json", headers)
+
+
+
+async def _validators(*variant) -> tuple[str, datetime]:
+    return common.validators(*await async_models.data_version(), *variant)
+
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return common.not_modified(request.headers.get("if-none-match"), etag)
+
+
+
+async def list_entries(request: Request, send):
+    try:
+        query = EntriesQuery.model_validate(request.query)
+    except ValidationError as e:
+        return await _send_json(send, 422, json.loads(e.json(include_url=False)))
+
+    accept = parse_accept_header(request.headers.get("accept"), MIMEAccept)
+    ndjson = accept.best_match(["application/json", serialization.NDJSON_MIMETYPE]) == serialization.NDJSON_MIMETYPE
+    etag, last_modified = await _validators("ndjson" if ndjson else "json")
+    headers = {**common.cache_headers(etag, last_modified), "Vary": "Accept"}
+    if _not_modified(request, etag):
+        return await _send_response(send, 304, headers=headers)
+
+    descending = query.order == "desc"
+    try:
+        after = models.decode_cursor(query.cursor, query.sort, descending) if query.cursor else None
+    except ValueError as e:
+        return await _send_json(send, 400, {"error": str(e)})
+
+    filters = dict(
+        after=after,
+        sort=query.sort,
+        descending=descending,
+        category=query.category,
+        min_amount=query.min_amount,
+        max_amount=query.max_amount,
+        name_prefix=query.name_prefix,
+    )
+
+    if ndjson:
+        # pas de Content-Length : reponse envoyee par morceaux
+        raw_headers = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+        raw_headers.append((b"content-type", serialization.NDJSON_MIMETYPE.encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": raw_headers})
+        async for rows in async_models.iter_entries(**filters):
+            await send({"type": "http.response.body", "body": serialization.ndjson_lines(rows), "more_body": True})
+        return await send({"type": "http.response.body", "body": b""})
+
+    rows, next_key = await async_models.list_entries(query.limit, **filters)
+    await _send_json(send, 200, {
+        "entries": [row._asdict() for row in rows],
+        "next": models.encode_cursor(query.sort, descending, next_key) if next_key else None,
+    }, headers)
+
+
+
+async def _read_entry(request: Request, send) -> EntryModel | None:
+    try:
+        return EntryModel.model_validate_json(await request.body())
+    except ValidationError as e:
+        await _send_json(send, 422, json.loads(e.json(include_url=False)))
+        return None
+
+
+
+async def create_entry(request: Request, send):
+    body = await _read_entry(request, send)
+    if body is None:
+        return
+    entry = await async_models.create_entry(body.name, body.amount, body.category)
+    await _send_json(send, 201, entry)
+
+
+
+async def get_entry(request: Request, send, uuid_id: uuid.UUID):
+    etag, last_modified = await _validators()
+    headers = common.cache_headers(etag, last_modified)
+    if _not_modified(request, etag):
+        return await _send_response(send, 304, headers=headers)
+    try:
+        entry = await async_models.get_entry(uuid_id)
+    except Exception:
+        return await _send_json(send, 404, common.NOT_FOUND)
+    await _send_json(send, 200, {
+        "id": entry.id.hex,
+        "name": entry.name,
+        "amount": entry.amount,
+        "category": entry.category,
+    }, headers)
+
+
+
+async def update_entry(request: Request, send, uuid_id: uuid.UUID):
+    body = await _read_entry(request, send)
+    if body is None:
+        return
+    await async_models.update_entry(uuid_id, body.name, body.amount, body.category)
+    await _send_json(send, 200, {"id": uuid_id.hex, **body.model_dump()})
+
+
+
+async def delete_entry(request: Request, send, uuid_id: uuid.UUID):
+    await async_models.delete_entry(uuid_id)
+    await _send_response(send, 204)
+
+
+
+COLLECTION_ROUTES = {"GET": list_entries, "POST": create_entry}
+ITEM_ROUTES = {"GET": get_entry, "PUT": update_entry, "DELETE": delete_entry}
+
+
+
+class AsyncAPI:
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def _route(self, request: Request):
+        if request.path == PREFIX:
+            return COLLECTION_ROUTES.get(request.method), None
+        if request.path.startswith(PREFIX + "/"):
+            id = request.path[len(PREFIX) + 1:]
+            # /entries/search et /entries/changes restent servis par Flask
+            if "/" not in id and id not in ("search", "changes"):
+                return ITEM_ROUTES.get(request.method), id
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return await self.fallback(scope, receive, send)
+
+        request = Request(scope, receive)
+        handler, id = self._route(request)
+        if handler is None:
+            return await self.fallback(scope, receive, send)
+        if not (config.LOG_REQUESTS or config.METRICS_ENABLED):
+            return await self._dispatch(request, send, handler, id)
+
+        # memes journaux et metriques que les hooks Flask ; le profileur par
+        # echantillonnage suit des threads et ne couvre pas ces routes
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = observability.start_request()
+        try:
+            await self._dispatch(request, send_with_status, handler, id)
+        finally:
+            stats = observability.end_request(token)
+            route = PREFIX if id is None else ITEM_ROUTE
+            common.record_request(route, request.path, request.method, status, stats)
+
+    async def _dispatch(self, request: Request, send, handler, id: str | None):
+        user = common.bearer_user(request.headers.get("authorization"))
+        if user is None:
+            return await _send_response(
+                send, 401, b"Unauthorized Access", "text/html; charset=utf-8",
+                {"WWW-Authenticate": 'Bearer realm="Authentication Required"'},
+            )
+        if user != "admin":
+            return await _send_json(send, 403, common.FORBIDDEN)
+
+        if id is None:
+            return await handler(request, send)
+        try:
+            uuid_id = uuid.UUID(id)
+        except ValueError:
+            return await _send_json(send, 400, common.INVALID_ID)
+        await handler(request, send, uuid_id)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_models.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+
+def create_asgi_app():
+    return AsyncAPI(WsgiToAsgi(create_app()))
+
+
+
+app = create_asgi_app()
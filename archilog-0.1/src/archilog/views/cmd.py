@@ -1,16 +1,19 @@
-import io
+import json
+import time
 import uuid
 
 import click
 
 import archilog.models as models
-import archilog.services as services
-from archilog.services import import_from_csv
+from archilog import setup_logging
+
+# analytics (numpy), services et jobs sont importes par les commandes qui
+# s'en servent : get-entry ou export-csv restent rapides a demarrer
 
 
 @click.group()
 def cli():
-    pass
+    setup_logging()
 
 
 
@@ -18,6 +21,34 @@ def cli():
 @cli.command()
 def init_db():
     models.init_db()
+
+
+
+
+@cli.command()
+@click.option("--to", "target", type=int, default=None, help="Version cible (par defaut la derniere)")
+@click.option("--status", is_flag=True, help="Afficher la version courante et les migrations en attente")
+def migrate(target: int | None, status: bool):
+    from archilog import migrations
+
+    try:
+        if status:
+            with models.get_engine().connect() as conn:
+                version = migrations.current_version(conn)
+                conn.commit()
+            click.echo(f"Version du schema : {version}")
+            for migration in migrations.pending(models.get_engine()):
+                click.echo(f"En attente : {migration.version} - {migration.description}")
+            return
+
+        models.metadata.create_all(models.get_engine())
+        applied = migrations.upgrade(models.get_engine(), target)
+        for migration in applied:
+            click.echo(f"Migration {migration.version} appliquee : {migration.description}")
+        if not applied:
+            click.echo("Schema deja a jour")
+    except Exception as e:
+        click.echo(f"Erreur lors de la migration : {str(e)}")
     
     
     
@@ -25,15 +56,96 @@ def init_db():
 @cli.command(name="get-entries")
 def get_entries_cli():
     try:
-        entries = models.get_all_entries()
-        for entry in entries:
-            click.echo(f"ID: {entry.id}, Name: {entry.name}, Amount: {entry.amount}, Category: {entry.category}")
+        for entries in models.iter_entry_batches():
+            click.echo("\n".join(
+                f"ID: {entry.id}, Name: {entry.name}, Amount: {entry.amount}, Category: {entry.category}"
+                for entry in entries
+            ))
     except Exception as e:
         click.echo(f"Erreur lors de la récupération des entrées : {str(e)}")
         
         
         
 
+@cli.command(name="report")
+def report_cli():
+    try:
+        summary = models.category_summary()
+        click.echo(f"{'Categorie':<20}{'Nombre':>10}{'Total':>14}{'Min':>12}{'Max':>12}{'Moyenne':>12}")
+        for row in summary:
+            click.echo(
+                f"{row['category'] or 'Aucune':<20}{row['count']:>10}{row['total']:>14.2f}"
+                f"{row['min']:>12.2f}{row['max']:>12.2f}{row['average']:>12.2f}"
+            )
+    except Exception as e:
+        click.echo(f"Erreur lors du calcul du rapport : {str(e)}")
+
+
+
+
+@cli.command(name="stats")
+@click.option("--bins", type=int, default=20, help="Nombre de classes de l'histogramme")
+@click.option("--json", "as_json", is_flag=True, help="Sortie JSON brute")
+def stats_cli(bins: int, as_json: bool):
+    from archilog import analytics
+
+    try:
+        stats = analytics.compute_stats(bins=bins)
+        if as_json:
+            click.echo(json.dumps(stats, indent=2))
+            return
+        if not stats["count"]:
+            click.echo("Aucune entree")
+            return
+
+        click.echo(f"Calcul : {stats['backend']}")
+        click.echo(
+            f"{stats['count']} entrees, total {stats['total']:.2f}, moyenne {stats['mean']:.2f}, "
+            f"ecart-type {stats['std']:.2f}, min {stats['min']:.2f}, max {stats['max']:.2f}"
+        )
+        click.echo("Quantiles : " + ", ".join(f"{k}={v:.2f}" for k, v in stats["quantiles"].items()))
+
+        click.echo("Histogramme :")
+        counts, edges = stats["histogram"]["counts"], stats["histogram"]["edges"]
+        peak = max(counts) or 1
+        for i, count in enumerate(counts):
+            click.echo(f"  [{edges[i]:>10.2f} ; {edges[i + 1]:>10.2f}] {count:>9} {'#' * round(40 * count / peak)}")
+
+        click.echo(f"{'Categorie':<20}{'Nombre':>10}{'Total':>14}{'Moyenne':>12}{'Mediane':>12}")
+        for row in stats["categories"]:
+            click.echo(
+                f"{row['category'] or 'Aucune':<20}{row['count']:>10}{row['total']:>14.2f}"
+                f"{row['mean']:>12.2f}{row['median']:>12.2f}"
+            )
+
+        outliers = stats["outliers"]
+        click.echo(
+            f"Valeurs aberrantes (hors [{outliers['low']:.2f} ; {outliers['high']:.2f}]) : {outliers['count']}"
+        )
+        for entry in outliers["largest"] + outliers["smallest"]:
+            click.echo(f"  {entry['id']} {entry['name']} {entry['amount']:.2f} {entry['category'] or 'Aucune'}")
+    except Exception as e:
+        click.echo(f"Erreur lors du calcul des statistiques : {str(e)}")
+
+
+
+
+@cli.command(name="rebuild-totals")
+def rebuild_totals_cli():
+    try:
+        differences = models.rebuild_totals()
+        for category, stored, expected in differences:
+            click.echo(f"Ecart sur {category or 'Aucune'} : stocke {stored}, attendu {expected}")
+        if differences:
+            click.echo(f"{len(differences)} categorie(s) corrigee(s)")
+        else:
+            click.echo("Totaux coherents avec la table profile")
+    except Exception as e:
+        click.echo(f"Erreur lors du recalcul des totaux : {str(e)}")
+
+
+
+
 @cli.command(name="get-entry")
 @click.option("--id", "entry_id", required=True, help="ID de l'entrée à récupérer")
 def get_entry_cli(entry_id: str):
@@ -43,7 +155,51 @@ def get_entry_cli(entry_id: str):
         click.echo(f"ID: {entry.id}, Name: {entry.name}, Amount: {entry.amount}, Category: {entry.category}")
     except Exception as e:
         click.echo(f"Erreur lors de la récupération de l'entrée : {str(e)}")
-        
+
+
+
+
+@cli.command(name="search")
+@click.argument("query")
+@click.option("--limit", default=20, type=click.IntRange(min=1), help="Nombre maximal de résultats")
+@click.option("--offset", default=0, type=click.IntRange(min=0), help="Résultats à sauter (pagination)")
+def search_cli(query: str, limit: int, offset: int):
+    try:
+        entries, next_offset = models.search_entries(query, limit, offset)
+        for entry in entries:
+            click.echo(f"ID: {entry.id}, Name: {entry.name}, Amount: {entry.amount}, Category: {entry.category}")
+        if not entries:
+            click.echo("Aucune entrée trouvée")
+        elif next_offset is not None:
+            click.echo(f"Suite : --offset {next_offset}")
+    except Exception as e:
+        click.echo(f"Erreur lors de la recherche : {str(e)}")
+
+
+
+@cli.command(name="changes")
+@click.option("--since", default=0, type=click.IntRange(min=0), help="Derniere version recue (0 : tout l'historique)")
+@click.option("--limit", default=1000, type=click.IntRange(min=1), help="Nombre maximal de changements")
+@click.option("--cursor", default=None, help="Curseur de la page suivante")
+def changes_cli(since: int, limit: int, cursor: str | None):
+    try:
+        after = models.decode_cursor(cursor, "version", False) if cursor else None
+        changes, next_key, version = models.list_changes(since, limit, after)
+        for change in changes:
+            if change.op == models.CHANGE_DELETE:
+                click.echo(f"[{change.version}] supprimee ID: {change.id}")
+            else:
+                click.echo(
+                    f"[{change.version}] ID: {change.id}, Name: {change.name}, "
+                    f"Amount: {change.amount}, Category: {change.category}"
+                )
+        if next_key is not None:
+            click.echo(f"Suite : --since {since} --cursor {models.encode_cursor('version', False, next_key)}")
+        else:
+            click.echo(f"A jour a la version {version} : --since {version} au prochain appel")
+    except Exception as e:
+        click.echo(f"Erreur lors de la lecture des changements : {str(e)}")
+
         
         
         
@@ -80,7 +236,7 @@ def delete_cli(entry_id: str):
 def update_cli(entry_id: str, name: str, amount: float, category: str):
     try:
         entry_uuid = uuid.UUID(entry_id)
-        entry = models.get_entry(entry_uuid)
+        entry = models.load_entry(entry_uuid)
         if not entry:
             click.echo(f"Erreur : Aucun utilisateur trouve avec l'ID {entry_id}.")
             return
@@ -101,13 +257,45 @@ def update_cli(entry_id: str, name: str, amount: float, category: str):
         
         
         
+@cli.command(name="apply-batch")
+@click.argument("batch_file", type=click.File("r", encoding="utf-8"))
+def apply_batch_cli(batch_file):
+    """Applique un fichier JSON {"create": [...], "update": [...], "delete": [...]}."""
+    try:
+        batch = json.load(batch_file)
+        if batch.get("create"):
+            created = models.create_entries([
+                {"name": e["name"], "amount": float(e["amount"]), "category": e.get("category")}
+                for e in batch["create"]
+            ])
+            click.echo(f"{len(created)} entree(s) creee(s)")
+        if batch.get("update"):
+            updated = models.update_entries([
+                {"id": uuid.UUID(e["id"]), "name": e["name"], "amount": float(e["amount"]), "category": e.get("category")}
+                for e in batch["update"]
+            ])
+            click.echo(f"{len(updated)}/{len(batch['update'])} entree(s) mise(s) a jour")
+        if batch.get("delete"):
+            deleted = models.delete_entries([uuid.UUID(id) for id in batch["delete"]])
+            click.echo(f"{len(deleted)}/{len(batch['delete'])} entree(s) supprimee(s)")
+    except (KeyError, ValueError) as e:
+        click.echo(f"Erreur : fichier de lot invalide ({str(e)})")
+    except Exception as e:
+        click.echo(f"Erreur lors de l'application du lot : {str(e)}")
+
+
+
+
 @cli.command(name="export-csv")
 @click.option("--output", type=click.Path(), default="exported_data.csv", help="Nom du fichier CSV a generer")
-def export_csv_cli(output):
+@click.option("--with-ids", is_flag=True, help="Inclure la colonne id (reimport en --upsert id sans doublon)")
+def export_csv_cli(output, with_ids):
+    from archilog import services
+
     try:
-        csv_output = services.export_to_csv() 
-        with open(output, "w", encoding="utf-8") as f:
-            f.write(csv_output.getvalue())  
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            for chunk in services.iter_csv_export(with_ids=with_ids):
+                f.write(chunk)
         click.echo(f"Donnees exportees dans '{output}'")
     except Exception as e:
         click.echo(f"Erreur lors de l'exportation CSV : {str(e)}")
@@ -116,11 +304,54 @@ def export_csv_cli(output):
 
 
 @cli.command(name="import-csv")
-@click.argument("csv_file", type=click.File("rb"))  
-def import_csv_cli(csv_file):
-    
+@click.argument("csv_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", type=int, default=None, help="Nombre de lignes inserees par transaction")
+@click.option("--all-or-nothing", is_flag=True, help="Annuler tout l'import a la moindre ligne invalide")
+@click.option("--job", "as_job", is_flag=True, help="Passer par le gestionnaire de taches d'import et suivre la progression")
+@click.option(
+    "--workers", type=int, default=None,
+    help="Processus d'analyse en parallele (fichiers sans saut de ligne entre guillemets)",
+)
+@click.option(
+    "--upsert", type=click.Choice(["id", "natural"]), default=None,
+    help="Mettre a jour les entrees existantes au lieu de les dupliquer : par colonne id, "
+         "ou par cle naturelle (ARCHILOG_IMPORT_NATURAL_KEY)",
+)
+def import_csv_cli(csv_file, batch_size, all_or_nothing, as_job, workers, upsert):
+    from archilog import jobs, services
+
     try:
-        import_from_csv(io.BytesIO(csv_file.read()))  
-        click.echo("Importation du fichier CSV réussie")
+        mode = services.ALL_OR_NOTHING if all_or_nothing else services.BEST_EFFORT
+        if as_job:
+            job = jobs.runner.submit(
+                csv_file, csv_file, mode=mode, delete_after=False, batch_size=batch_size, workers=workers,
+                upsert=upsert,
+            )
+            while not job.finished:
+                time.sleep(0.5)
+                if job.report is not None:
+                    click.echo(f"{job.report.rows_read} lignes traitees ({job.report.rows_per_second:.0f} lignes/s)")
+            if job.status == jobs.FAILED:
+                raise Exception(job.message)
+            report = job.report
+        else:
+            report = services.import_csv_file(
+                csv_file, batch_size=batch_size, mode=mode, workers=workers, upsert=upsert
+            )
+        for error in report.errors:
+            click.echo(f"Ligne {error.line} : {error.message}")
+        click.echo(
+            f"{report.rows_imported}/{report.rows_read} lignes importees "
+            f"en {report.elapsed:.2f}s ({report.rows_per_second:.0f} lignes/s)"
+        )
+        if upsert:
+            click.echo(
+                f"dont {report.rows_updated} mises a jour ; {report.rows_unchanged} inchangees, "
+                f"{report.duplicates} doublons ignores"
+            )
+        if report.ok:
+            click.echo("Importation du fichier CSV réussie")
+        elif mode == services.ALL_OR_NOTHING:
+            click.echo("Importation annulee : aucune ligne n'a ete enregistree")
     except Exception as e:
         click.echo(f"Erreur lors de l'importation : {str(e)}")
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+from werkzeug.http import http_date, parse_etags
+
+from archilog import auth, config, metrics, observability
+
+# partage par l'API Flask (api.py) et l'API asynchrone (asgi.py) : memes
+# validateurs HTTP, memes messages d'erreur, memes mesures par requete
+
+FORBIDDEN = {"error": "Accès refusé. Vous devez être admin."}
+INVALID_ID = {"error": "ID invalide, le format UUID attendu"}
+NOT_FOUND = {"error": "Entrée introuvable"}
+
+
+
+def bearer_user(authorization: str | None) -> str | None:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return auth.check_token(token)
+
+
+
+def validators(version: int, updated_at: float, *variant) -> tuple[str, datetime]:
+    etag = "-".join(str(part) for part in (version, *variant))
+    return etag, datetime.fromtimestamp(int(updated_at), timezone.utc)
+
+
+
+def not_modified(if_none_match: str | None, etag: str) -> bool:
+    # seul If-None-Match est pris en compte : toute reponse porte un ETag, et
+    # If-Modified-Since (a la seconde) donnerait un faux 304 apres deux
+    # ecritures dans la meme seconde ; Last-Modified reste informatif
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(etag)
+
+
+
+def cache_headers(etag: str, last_modified: datetime) -> dict:
+    return {"ETag": f'"{etag}"', "Last-Modified": http_date(last_modified), "Cache-Control": "no-cache"}
+
+
+
+def record_request(route: str | None, path: str, method: str, status: int, stats: observability.RequestStats) -> None:
+    # route : modele de la route servie, None si aucune ne correspond
+    if config.LOG_REQUESTS:
+        observability.log_request(route or path, method, status, stats)
+    if config.METRICS_ENABLED:
+        # les chemins sans route ne deviennent pas des labels : cardinalite bornee
+        route = route or "<inconnue>"
+        metrics.REQUEST_SECONDS.observe(stats.total_time, route, method, status)
+        metrics.REQUEST_DB_SECONDS.observe(stats.db_time, route, method)
+        metrics.REQUEST_QUERIES.observe(stats.queries, route, method)
@@ -0,0 +1,56 @@
+import hmac
+
+from flask import Blueprint, Response, request
+
+import archilog.auth as auth
+import archilog.jobs as jobs
+import archilog.models as models
+from archilog import config, metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+
+@metrics.collected("archilog_db_pool_connections", "Connexions du pool SQLAlchemy", labelnames=("state",))
+def collect_pool():
+    pool = models.get_engine().pool
+    # les pools SQLite en memoire (StaticPool, SingletonThreadPool) n'ont pas de taille
+    if hasattr(pool, "checkedout"):
+        yield "size", pool.size()
+        yield "checked_in", pool.checkedin()
+        yield "checked_out", pool.checkedout()
+        yield "overflow", pool.overflow()
+
+
+
+@metrics.collected(
+    "archilog_cache_events_total", "Evenements des caches applicatifs", kind="counter", labelnames=("cache", "event"),
+)
+def collect_cache_events():
+    for name, cache in (("entry", models.entry_cache), ("credentials", auth.credential_cache)):
+        for event, value in cache.stats.to_dict().items():
+            if event != "hit_ratio":
+                yield name, event, value
+
+
+
+@metrics.collected("archilog_cache_entries", "Entrees presentes dans les caches applicatifs", labelnames=("cache",))
+def collect_cache_sizes():
+    yield "entry", len(models.entry_cache)
+    yield "credentials", len(auth.credential_cache)
+
+
+
+@metrics.collected("archilog_import_jobs", "Taches d'import connues par statut", labelnames=("status",))
+def collect_import_jobs():
+    yield from jobs.runner.counts().items()
+
+
+
+@metrics_bp.route("/metrics")
+def metrics_view():
+    if config.METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), config.METRICS_TOKEN.encode()):
+            return Response("Unauthorized Access", status=401)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
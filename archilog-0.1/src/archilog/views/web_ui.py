@@ -1,38 +1,34 @@
-import io
+import os
 import uuid
 
 from flask import (
     Blueprint,
     Response,
+    abort,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
+    stream_with_context,
     url_for,
 )
 from flask_httpauth import HTTPBasicAuth
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileAllowed, FileRequired
-from werkzeug.security import check_password_hash, generate_password_hash
-from wtforms import FileField, FloatField, StringField, SubmitField
+from wtforms import FileField, FloatField, SelectField, StringField, SubmitField
 from wtforms.validators import DataRequired, Length, NumberRange, Optional
 
+import archilog.jobs as jobs
 import archilog.models as models
 import archilog.services as services
-from archilog.services import import_from_csv
+from archilog.auth import check_password
 
 auth = HTTPBasicAuth()
 
 
 
 
-users = {
-    "admin": generate_password_hash("adminpassword"),  
-    "user": generate_password_hash("userpassword")     
-}
-
-
-
 roles = {
     "admin": "admin",  
     "user": "user"    
@@ -43,8 +39,7 @@ roles = {
 
 @auth.verify_password
 def verify_password(username, password):
-    if username in users and check_password_hash(users.get(username), password):
-        return username
+    return check_password(username, password)
 
 
 
@@ -54,6 +49,9 @@ def get_user_roles(username):
     return roles.get(username, "user")  
 
 
+SEARCH_PAGE_SIZE = 50
+
+
 web_ui_bp = Blueprint("web_ui", __name__, url_prefix='/', template_folder="../templates")
 
 
@@ -66,12 +64,26 @@ def index():
 
 
 
+def _entries_page(form: "EntriesPageForm"):
+    # pagination par cle : cout constant quelle que soit la taille du grand livre
+    descending = form.order.data == "desc"
+    cursor = request.args.get("cursor")
+    after = models.decode_cursor(cursor, form.sort.data, descending) if cursor else None
+    rows, next_key = models.list_entries(form.limit.data, after=after, sort=form.sort.data, descending=descending)
+    return rows, models.encode_cursor(form.sort.data, descending, next_key) if next_key else None
+
+
+
+
 @web_ui_bp.route("/all_entries", methods=["GET"])
 @auth.login_required(role="admin")  
 def all_entries():
+    form = EntriesPageForm(request.args)
+    if not form.validate():
+        form = EntriesPageForm(None)
     try:
-        entries = models.get_all_entries()  
-        return render_template("all_entries.html", entries=entries)  
+        entries, next_cursor = _entries_page(form)
+        return render_template("all_entries.html", form=form, entries=entries, next_cursor=next_cursor)
     except Exception as e:
         flash(f"Erreur lors de la récupération des entrées : {str(e)}", "danger")
         return redirect(url_for('web_ui.index')) 
@@ -79,6 +91,59 @@ def all_entries():
 
 
 
+@web_ui_bp.route("/all_entries/rows", methods=["GET"])
+@auth.login_required(role="admin")
+def all_entries_rows():
+    # fragment charge par "Charger plus" : lignes HTML deja rendues et curseur suivant
+    form = EntriesPageForm(request.args)
+    if not form.validate():
+        return jsonify({"error": form.errors}), 400
+    try:
+        entries, next_cursor = _entries_page(form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "rows": render_template("_entry_rows.html", entries=entries),
+        "next": next_cursor,
+    })
+
+
+
+
+@web_ui_bp.route("/search", methods=["GET"])
+@auth.login_required(role="admin")
+def search():
+    form = SearchForm(request.args)
+
+    entries, next_offset = [], None
+    offset = request.args.get("offset", 0, type=int)
+    if form.q.data and form.validate():
+        try:
+            entries, next_offset = models.search_entries(form.q.data, SEARCH_PAGE_SIZE, max(offset, 0))
+        except Exception as e:
+            flash(f"Erreur lors de la recherche : {str(e)}", "danger")
+
+    return render_template(
+        "search.html", form=form, entries=entries, offset=offset,
+        next_offset=next_offset, page_size=SEARCH_PAGE_SIZE,
+    )
+
+
+
+
+@web_ui_bp.route("/reports", methods=["GET"])
+@auth.login_required(role="admin")
+def reports():
+    try:
+        summary = models.category_summary()
+        return render_template("report.html", summary=summary)
+    except Exception as e:
+        flash(f"Erreur lors du calcul du rapport : {str(e)}", "danger")
+        return redirect(url_for('web_ui.index'))
+
+
+
+
 @web_ui_bp.route("/entry_specifique", methods=["GET", "POST"])
 @auth.login_required(role="admin")
 def entry_specifique():
@@ -151,7 +216,7 @@ def update():
         category = form.category.data
 
         try:
-            entry = models.get_entry(uuid.UUID(entry_id))
+            entry = models.load_entry(uuid.UUID(entry_id))
             updated_name = name if name else entry.name
             updated_amount = float(amount) if amount else entry.amount
             updated_category = category if category else entry.category
@@ -181,11 +246,13 @@ def import_csv():
             flash("Erreur : Aucun fichier sélectionné", "danger")
         else:
             try:
-    
-                stream = io.BytesIO(file.read())
-                import_from_csv(stream)
-                flash("Importation réussie", "success")
-                return redirect(url_for('web_ui.index'))
+                path = jobs.spool_upload(file)
+                try:
+                    job = jobs.runner.submit(path, file.filename)
+                except jobs.JobQueueFull:
+                    os.remove(path)
+                    raise
+                return redirect(url_for('web_ui.import_job', job_id=job.id))
             except Exception as e:
                 flash(f"Erreur lors de l'importation : {str(e)}", "danger")
 
@@ -194,20 +261,29 @@ def import_csv():
 
 
 
+@web_ui_bp.route("/import_jobs/<job_id>")
+@auth.login_required(role="admin")
+def import_job(job_id):
+    job = jobs.runner.get(job_id)
+    if job is None:
+        abort(404)
+    return render_template("import_job.html", job=job.to_dict(max_errors=20))
+
+
+
+
 
 
 @web_ui_bp.route("/export_csv")
 @auth.login_required(role=["user", "admin"])  
 def export_csv():
-    try:
-        csv_output = services.export_to_csv()  
-        return Response(
-            csv_output.getvalue(), 
-            mimetype="text/csv",
-            headers={"Content-Disposition": "attachment; filename=exported_data.csv"}  
-        )
-    except Exception as e:
-        return f"Erreur lors de l'exportation : {str(e)}", 500
+    # flux paresseux : une erreur survient pendant l'envoi, elle est
+    # journalisee par services.iter_csv_export
+    return Response(
+        stream_with_context(services.iter_csv_export()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=exported_data.csv"}
+    )
 
 
 
@@ -219,6 +295,26 @@ class EntrySearchForm(FlaskForm):
 
 
 
+class EntriesPageForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    sort = SelectField("Trier par", choices=[("id", "ID"), ("name", "Nom"), ("amount", "Montant")], default="id")
+    order = SelectField("Ordre", choices=[("asc", "Croissant"), ("desc", "Décroissant")], default="asc")
+    limit = SelectField("Lignes par page", choices=[(25, "25"), (50, "50"), (100, "100"), (200, "200")], coerce=int, default=50)
+    submit = SubmitField("Afficher")
+
+
+
+class SearchForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    q = StringField("Nom ou catégorie", validators=[DataRequired(), Length(max=200)])
+    submit = SubmitField("Rechercher")
+
+
+
 class EntryForm(FlaskForm):
     class Meta:
         csrf = False  
@@ -0,0 +1,84 @@
+import uuid
+
+import pytest
+
+from archilog import config, models
+
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setattr(models, "_engine", None)
+    monkeypatch.setattr(models, "_entry_sync", {"version": None, "checked": 0.0})
+    models.init_db()
+    models.entry_cache.clear()
+    engine = models.get_engine()
+    yield engine
+    models.entry_cache.clear()
+    engine.dispose()
+
+
+
+def _create(name: str) -> uuid.UUID:
+    id = uuid.uuid4()
+    with models.transaction() as conn:
+        models.insert_rows(conn, [{"id": id.hex, "name": name, "amount": 10.0, "category": "test"}])
+    return id
+
+
+
+def _write_elsewhere(monkeypatch, id: uuid.UUID, name: str) -> None:
+    # ecriture d'un autre processus : les listeners on_write de celui-ci ne la voient pas
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "_write_listeners", [])
+        with models.transaction() as conn:
+            models.update_rows(conn, [{"id": id.hex, "name": name, "amount": 10.0, "category": "test"}])
+
+
+
+def test_cache_hit_does_not_query(db, monkeypatch):
+    id = _create("loyer")
+    models.get_entry(id)
+    monkeypatch.setattr(config, "ENTRY_CACHE_SYNC_MS", 60_000)
+
+    queries = []
+    monkeypatch.setattr(models, "load_entry", lambda id: queries.append(id))
+    monkeypatch.setattr(models, "get_engine", lambda: queries.append("engine"))
+    assert models.get_entry(id).name == "loyer"
+    assert models.get_entry(id, models._entry_sync["version"]).name == "loyer"
+    assert queries == []
+
+
+
+def test_foreign_write_is_seen_after_sync(db, monkeypatch):
+    id, other = _create("loyer"), _create("garage")
+    models.get_entry(id)
+    models.get_entry(other)
+    monkeypatch.setattr(config, "ENTRY_CACHE_SYNC_MS", 60_000)
+
+    _write_elsewhere(monkeypatch, id, "loyer modifie")
+    # dans la fenetre de synchro, l'entree en cache est encore servie
+    assert models.get_entry(id).name == "loyer"
+    # une data_version plus recente (ETag) force la synchro
+    version, _ = models.data_version()
+    assert models.get_entry(id, version).name == "loyer modifie"
+    # seule l'entree modifiee a quitte le cache
+    misses = models.entry_cache.stats.misses
+    assert models.get_entry(other).name == "garage"
+    assert models.entry_cache.stats.misses == misses
+
+
+
+def test_foreign_write_is_seen_after_sync_interval(db, monkeypatch):
+    id = _create("loyer")
+    models.get_entry(id)
+    monkeypatch.setattr(config, "ENTRY_CACHE_SYNC_MS", 0)
+
+    _write_elsewhere(monkeypatch, id, "loyer modifie")
+    assert models.get_entry(id).name == "loyer modifie"
+
+    with models.transaction() as conn:
+        models.delete_rows(conn, [id.hex])
+    with pytest.raises(Exception):
+        models.get_entry(id)
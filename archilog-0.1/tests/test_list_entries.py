@@ -0,0 +1,41 @@
+import uuid
+
+import pytest
+
+from archilog import config, models
+
+NAMES = ["Loyer mars", "loyer avril", "loyer_juin", "loyer%mai", "loyers", "garage"]
+
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setattr(models, "_engine", None)
+    models.init_db()
+    with models.transaction() as conn:
+        models.insert_rows(conn, [
+            {"id": uuid.uuid4().hex, "name": name, "amount": float(i), "category": None}
+            for i, name in enumerate(NAMES)
+        ])
+    engine = models.get_engine()
+    yield engine
+    engine.dispose()
+
+
+
+@pytest.mark.parametrize("sort", ["id", "name", "amount"])
+@pytest.mark.parametrize("prefix", ["loyer", "Loyer", "loyer_", "loyer%", "z"])
+def test_name_prefix_matches_startswith(db, sort, prefix):
+    entries, _ = models.list_entries(50, sort=sort, name_prefix=prefix)
+    # sensible a la casse, % et _ pris litteralement
+    assert sorted(entry.name for entry in entries) == sorted(name for name in NAMES if name.startswith(prefix))
+
+
+
+def test_name_prefix_uses_name_index(db):
+    stmt = models._entries_statement(None, "id", False, None, None, None, "loyer")
+    with db.connect() as conn:
+        compiled = stmt.compile(conn, compile_kwargs={"literal_binds": True})
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}"))
+    assert "USING INDEX ix_profile_name" in plan
@@ -0,0 +1,177 @@
+import random
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from archilog import config, models
+
+WORDS = ["loyer", "Café", "crème", "garage", "courses", "électricité", "train", "pharmacie", "cadeau"]
+CATEGORIES = ["logement", "Santé", "transport", "", None]
+QUERIES = ["loyer", "cafe", "creme garage", "ele", "sante", "train transport", "pharm", "zzz"]
+
+
+
+@pytest.fixture(params=["fts", "terms"])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setattr(models, "_engine", None)
+    models.init_db()
+    engine = models.get_engine()
+    if request.param == "terms":
+        # repli hors FTS5 : la table search_terms est tenue a jour par les ecritures
+        models._search_backends[str(engine.url)] = False
+    else:
+        with engine.connect() as conn:
+            if not models.uses_fts(conn):
+                pytest.skip("SQLite compile sans FTS5")
+    yield engine
+    models._search_backends.clear()
+    engine.dispose()
+
+
+
+def _row(rng: random.Random, id: str | None = None) -> dict:
+    return {
+        "id": id or uuid.uuid4().hex,
+        "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+        "amount": round(rng.uniform(-50, 500), 2),
+        "category": rng.choice(CATEGORIES),
+    }
+
+
+
+def _table_rows(conn) -> dict:
+    return {row.id: row for row in conn.execute(select(*models.ENTRY_COLUMNS))}
+
+
+
+def _expected_search(rows: dict, query: str) -> set[str]:
+    # meme regle que search_entries : tous les mots, le dernier en prefixe
+    terms = list(dict.fromkeys(models.search_terms(query)))
+    found = set()
+    for row in rows.values():
+        words = models.search_terms(row.name) + models.search_terms(row.category)
+        if all(
+            any(word.startswith(term) if models._is_prefix(terms, i) else word == term for word in words)
+            for i, term in enumerate(terms)
+        ):
+            found.add(row.id)
+    return found
+
+
+
+def _apply_batch(rng: random.Random, ids: list[str]) -> None:
+    op = rng.choice(["insert", "update", "delete", "upsert_id", "upsert_key"])
+    with models.transaction() as conn:
+        if op == "insert" or not ids:
+            rows = [_row(rng) for _ in range(rng.randint(1, 20))]
+            models.insert_rows(conn, rows)
+            ids.extend(row["id"] for row in rows)
+        elif op == "update":
+            # ids repetees et ids inconnues dans le meme lot
+            targets = rng.choices(ids, k=rng.randint(1, 15)) + [uuid.uuid4().hex]
+            models.update_rows(conn, [_row(rng, id) for id in targets])
+        elif op == "delete":
+            targets = rng.choices(ids, k=rng.randint(1, 8)) + [uuid.uuid4().hex]
+            models.delete_rows(conn, targets)
+            ids[:] = [id for id in ids if id not in targets]
+        elif op == "upsert_id":
+            new = uuid.uuid4().hex
+            targets = rng.choices(ids, k=rng.randint(1, 10)) + [new, new]
+            models.upsert_rows(conn, [_row(rng, id) for id in targets])
+            ids.append(new)
+        else:
+            current = _table_rows(conn)
+            # meme cle naturelle sous une nouvelle id : doit retomber sur la ligne existante
+            rows = [{**current[id]._asdict(), "id": uuid.uuid4().hex} for id in rng.choices(ids, k=rng.randint(1, 10))]
+            rows.extend(_row(rng) for _ in range(rng.randint(0, 5)))
+            models.upsert_rows(conn, rows, key=("name", "amount", "category"))
+            ids[:] = list(_table_rows(conn))
+
+
+
+def test_mixed_batches_keep_totals_and_search_in_sync(db):
+    rng = random.Random(8)
+    ids = []
+    for _ in range(60):
+        _apply_batch(rng, ids)
+
+    with db.connect() as conn:
+        rows = _table_rows(conn)
+    assert set(ids) == set(rows)
+
+    expected = {}
+    for row in rows.values():
+        summary = expected.setdefault(row.category or None, {"count": 0, "total": 0.0, "min": row.amount, "max": row.amount})
+        summary["count"] += 1
+        summary["total"] += row.amount
+        summary["min"] = min(summary["min"], row.amount)
+        summary["max"] = max(summary["max"], row.amount)
+    summary = {item["category"]: item for item in models.category_summary()}
+    assert summary.keys() == expected.keys()
+    for category, want in expected.items():
+        assert summary[category]["count"] == want["count"]
+        assert summary[category]["total"] == pytest.approx(want["total"])
+        assert (summary[category]["min"], summary[category]["max"]) == (want["min"], want["max"])
+
+    for query in QUERIES:
+        found, next_offset = models.search_entries(query, limit=len(rows) + 1)
+        assert next_offset is None
+        assert {row.id for row in found} == _expected_search(rows, query), query
+
+    # rebuild_totals rend les ecarts constates avant reconstruction : aucun
+    assert models.rebuild_totals() == []
+
+
+
+def test_change_feed_matches_table(db):
+    rng = random.Random(80)
+    ids = []
+    deleted = set()
+    for _ in range(30):
+        before = set(ids)
+        _apply_batch(rng, ids)
+        deleted |= before - set(ids)
+
+    changes, next_key, version = models.list_changes(0, limit=10_000)
+    assert next_key is None
+    assert version == models.data_version()[0]
+
+    with db.connect() as conn:
+        rows = _table_rows(conn)
+    upserts = {change.id: change for change in changes if change.op == models.CHANGE_UPSERT}
+    assert upserts.keys() == rows.keys()
+    for id, change in upserts.items():
+        assert (change.name, change.amount, change.category) == (rows[id].name, rows[id].amount, rows[id].category)
+    tombstones = {change.id for change in changes if change.op == models.CHANGE_DELETE}
+    assert tombstones == deleted - set(rows)
+
+
+
+def test_upsert_by_natural_key_matches_whole_key(db):
+    rows = [
+        {"id": "a" * 32, "name": "loyer", "amount": 800.0, "category": "logement"},
+        {"id": "b" * 32, "name": "loyer", "amount": 900.0, "category": None},
+        {"id": "c" * 32, "name": "garage", "amount": 80.0, "category": "logement"},
+        # cle deja en double dans la table : la plus petite id est mise a jour
+        {"id": "e" * 32, "name": "cafe", "amount": 3.0, "category": ""},
+        {"id": "d" * 32, "name": "cafe", "amount": 2.0, "category": None},
+    ]
+    with models.transaction() as conn:
+        models.insert_rows(conn, rows)
+        inserted, updated = models.upsert_rows(conn, [
+            {"id": uuid.uuid4().hex, "name": "loyer", "amount": 850.0, "category": "logement"},
+            {"id": uuid.uuid4().hex, "name": "loyer", "amount": 950.0, "category": ""},
+            {"id": uuid.uuid4().hex, "name": "cafe", "amount": 2.5, "category": None},
+            {"id": uuid.uuid4().hex, "name": "garage", "amount": 85.0, "category": "transport"},
+        ], key=("category", "name"))
+        table = _table_rows(conn)
+
+    assert (inserted, updated) == (1, 3)
+    assert table["a" * 32].amount == 850.0
+    assert table["b" * 32].amount == 950.0
+    assert table["d" * 32].amount == 2.5
+    assert table["e" * 32].amount == 3.0
+    assert table["c" * 32].amount == 80.0
+    assert models.rebuild_totals() == []